@@ -0,0 +1,366 @@
+#!/usr/bin/env python3
+"""
+合成した Facebook エクスポートで変換・分類の各段階を計測するベンチマーク
+
+使い方:
+  python benchmark.py --posts 20000 --output bench.json
+
+結果は JSON で出力する（段階ごとのスループット・レイテンシのパーセンタイル・
+投稿 1 件あたりの保持メモリとメモリブロック数・最大 RSS）。
+コミットごとに保存しておけば性能の劣化を比較できる。
+"""
+
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+from classify_books import classify_post
+from convert import (
+    SlugIndex,
+    generate_hugo_content,
+    iter_oldest_first_by_day,
+    load_facebook_posts,
+    parse_post,
+    parse_posts,
+    render_post,
+    write_post_bundle,
+)
+from review_posts import PUBLISHER_DOMAINS, contains_publisher_url
+
+EXPORT_FILENAME = 'your_posts__check_ins__photos_and_videos_1.json'
+
+# 本文の材料（Facebook と同じく UTF-8 を Latin-1 として書き出す）
+SENTENCES = [
+    '読了。とても面白かった',
+    '「吾輩は猫である」を読んだ',
+    '本日は晴れ',
+    '今日のランチはカレー',
+    '著者の主張にはほぼ同意',
+    '第3章の議論が興味深い',
+    'Kindle で買った',
+    '図書館で借りた本',
+    '週末は山に登った',
+    '日本の基本的な制度について',
+    'ISBN 978-4-00-000000-0',
+    'hello world',
+]
+OTHER_HOSTS = ['example.com', 'www.youtube.com', 'twitter.com', 'news.yahoo.co.jp', 'github.com']
+PLACES = [('東京駅', '東京都千代田区丸の内'), ('京都駅', '京都府京都市下京区'), ('札幌', '北海道')]
+
+
+def mojibake(text: str) -> str:
+    """Facebook のエクスポートと同じ形（UTF-8 バイト列を Latin-1 として解釈した文字列）にする"""
+    return text.encode('utf-8').decode('latin-1')
+
+
+def generate_export(
+    root: Path,
+    posts: int,
+    media_ratio: float = 0.3,
+    link_ratio: float = 0.3,
+    place_ratio: float = 0.1,
+    image_size: int = 64 * 1024,
+    image_count: int = 200,
+    seed: int = 0
+) -> tuple[Path, Path]:
+    """
+    root 以下に合成エクスポートを作る
+    Returns: (投稿 JSON のパス, source_base)
+    """
+    rng = random.Random(seed)
+    source_base = root / 'your_facebook_activity'
+    media_dir = source_base / 'posts' / 'media'
+    media_dir.mkdir(parents=True, exist_ok=True)
+
+    uris = []
+    for i in range(image_count):
+        uri = f'posts/media/image_{i:05d}.jpg'
+        with open(source_base / uri, 'wb') as f:
+            f.write(rng.randbytes(image_size))
+        uris.append(uri)
+
+    json_path = source_base / 'posts' / EXPORT_FILENAME
+    timestamp = 1_700_000_000
+    with open(json_path, 'w', encoding='utf-8') as f:
+        f.write('[')
+        for i in range(posts):
+            timestamp -= rng.randint(60, 86400)
+            post = {'timestamp': timestamp}
+            text = '\n'.join(rng.choice(SENTENCES) for _ in range(rng.randint(1, 12)))
+            if rng.random() < 0.9:
+                post['data'] = [{'post': mojibake(text)}]
+
+            data = []
+            r = rng.random()
+            if r < media_ratio:
+                for _ in range(rng.randint(1, 4)):
+                    data.append({'media': {
+                        'uri': rng.choice(uris),
+                        'description': mojibake(rng.choice(SENTENCES)),
+                        'title': '',
+                    }})
+            elif r < media_ratio + link_ratio:
+                host = rng.choice(PUBLISHER_DOMAINS if rng.random() < 0.5 else OTHER_HOSTS)
+                data.append({'external_context': {
+                    'url': f'https://{host}/{rng.randrange(10 ** 9)}',
+                    'name': mojibake(rng.choice(SENTENCES)),
+                }})
+            elif r < media_ratio + link_ratio + place_ratio:
+                name, address = rng.choice(PLACES)
+                data.append({'place': {'name': mojibake(name), 'address': mojibake(address)}})
+            if data:
+                post['attachments'] = [{'data': data}]
+
+            if i:
+                f.write(',')
+            json.dump(post, f)
+        f.write(']')
+
+    return json_path, source_base
+
+
+def contains_publisher_url_reference(content: str) -> bool:
+    """ドメインを 1 つずつ部分文字列検索する従来の出版社 URL 判定（照合器との比較用）"""
+    for domain in PUBLISHER_DOMAINS:
+        if domain in content:
+            return True
+    return False
+
+
+def generate_synthetic_posts(count: int, seed: int = 0) -> list[str]:
+    """照合器のベンチマーク用に、URL を含む・含まない投稿本文を生成する"""
+    rng = random.Random(seed)
+    words = ['読了', '本日は晴れ', 'とても面白かった', '第3章', '著者の主張', 'ランチ',
+             '今週の振り返り', 'Kindle', 'おすすめ', '日本語', '技術書', 'hello world']
+    other_hosts = ['example.com', 'www.youtube.com', 'twitter.com', 'www.amazon.co.jp/dp',
+                   'news.yahoo.co.jp', 'www.nikkei.com/article', 'github.com']
+    posts = []
+    for _ in range(count):
+        parts = [rng.choice(words) for _ in range(rng.randint(10, 80))]
+        r = rng.random()
+        if r < 0.2:
+            domain = rng.choice(PUBLISHER_DOMAINS)
+            parts.insert(rng.randrange(len(parts) + 1), f"https://{domain}/{rng.randrange(10**9)}")
+        elif r < 0.6:
+            host = rng.choice(other_hosts)
+            parts.insert(rng.randrange(len(parts) + 1), f"https://{host}/{rng.randrange(10**9)}")
+        posts.append(' '.join(parts))
+    return posts
+
+
+def benchmark_publisher_matcher(count: int = 100_000) -> dict:
+    """従来のループと照合器の速度を比較し、結果が一致することを確認する"""
+    posts = generate_synthetic_posts(count)
+
+    start = time.perf_counter()
+    expected = [contains_publisher_url_reference(p) for p in posts]
+    reference_sec = time.perf_counter() - start
+
+    start = time.perf_counter()
+    actual = [contains_publisher_url(p) for p in posts]
+    matcher_sec = time.perf_counter() - start
+
+    return {
+        'posts': count,
+        'matched': sum(actual),
+        'reference_sec': reference_sec,
+        'matcher_sec': matcher_sec,
+        'speedup': reference_sec / matcher_sec if matcher_sec else float('inf'),
+        'identical': expected == actual,
+    }
+
+
+def summarize(latencies: list[float], total_sec: float) -> dict:
+    """レイテンシ（秒）の一覧からスループットとパーセンタイルを求める"""
+    ordered = sorted(latencies)
+
+    def percentile(p: float) -> float:
+        if not ordered:
+            return 0.0
+        k = min(len(ordered) - 1, max(0, round(p / 100 * len(ordered)) - 1))
+        return ordered[k] * 1000
+
+    return {
+        'count': len(ordered),
+        'total_sec': total_sec,
+        'throughput_per_sec': len(ordered) / total_sec if total_sec else 0.0,
+        'p50_ms': percentile(50),
+        'p90_ms': percentile(90),
+        'p99_ms': percentile(99),
+        'max_ms': ordered[-1] * 1000 if ordered else 0.0,
+    }
+
+
+def timed_each(func, items) -> tuple[list, dict]:
+    """items の各要素に func を適用し、結果と計測値を返す"""
+    results = []
+    latencies = []
+    start = time.perf_counter()
+    for item in items:
+        t0 = time.perf_counter()
+        results.append(func(item))
+        latencies.append(time.perf_counter() - t0)
+    return results, summarize(latencies, time.perf_counter() - start)
+
+
+def _traced_blocks() -> int:
+    """tracemalloc が追跡中のメモリブロック数"""
+    return sum(stat.count for stat in tracemalloc.take_snapshot().statistics('filename'))
+
+
+def measure_post_memory(json_path: Path) -> dict:
+    """
+    生の投稿 JSON（dict）と Post に変換した後の保持メモリを tracemalloc で測る
+    計測のオーバーヘッドが大きいため、時間の計測とは別に読み直す
+    """
+    tracemalloc.start()
+    try:
+        posts = load_facebook_posts(json_path)
+        count = len(posts) or 1
+        raw_bytes = tracemalloc.get_traced_memory()[0]
+        raw_blocks = _traced_blocks()
+        tracemalloc.reset_peak()
+        parse_posts(posts)
+        model_bytes, peak_bytes = tracemalloc.get_traced_memory()
+        model_blocks = _traced_blocks()
+    finally:
+        tracemalloc.stop()
+    return {
+        'raw_bytes_per_post': raw_bytes / count,
+        'raw_blocks_per_post': raw_blocks / count,
+        'model_bytes_per_post': model_bytes / count,
+        'model_blocks_per_post': model_blocks / count,
+        'parse_peak_bytes_per_post': peak_bytes / count,
+    }
+
+
+def peak_rss_mb() -> float:
+    """プロセスの最大 RSS（MB）。取得できない環境では None"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux は KB、macOS はバイト単位
+    return peak / (1 << 20) if sys.platform == 'darwin' else peak / 1024
+
+
+def git_revision() -> str:
+    """計測したコミット（取得できなければ None）"""
+    try:
+        out = subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=Path(__file__).parent,
+                             capture_output=True, text=True, check=True)
+        return out.stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmark(args: argparse.Namespace, workdir: Path) -> dict:
+    """各段階を順に計測する"""
+    json_path, source_base = generate_export(
+        workdir / 'export', args.posts, args.media_ratio, args.link_ratio,
+        args.place_ratio, args.image_size, args.image_count, args.seed
+    )
+    output_dir = workdir / 'hugo-blog'
+    content_dir = output_dir / 'content' / 'posts'
+    static_dir = output_dir / 'static' / 'images'
+    content_dir.mkdir(parents=True, exist_ok=True)
+    static_dir.mkdir(parents=True, exist_ok=True)
+
+    stages = {}
+
+    start = time.perf_counter()
+    posts = load_facebook_posts(json_path)
+    load_sec = time.perf_counter() - start
+    stages['load_facebook_posts'] = {
+        'count': len(posts),
+        'total_sec': load_sec,
+        'throughput_per_sec': len(posts) / load_sec if load_sec else 0.0,
+        'bytes': os.path.getsize(json_path),
+    }
+
+    posts, stages['parse_post'] = timed_each(parse_post, posts)
+    _, stages['generate_hugo_content'] = timed_each(
+        lambda post: generate_hugo_content(post, static_dir, source_base), posts)
+
+    rendered = list(iter_oldest_first_by_day(
+        render_post(post, static_dir, source_base) for post in posts))
+    # 書き込み段階（ディレクトリ作成・メディアコピー・index.md 書き出し）
+    # 変換と同じく重複するディレクトリ名には接尾辞を付け、別々の Page Bundle に書き出す
+    slug_index = SlugIndex()
+    for r in rendered:
+        r['dirname'] = slug_index.assign(r['dirname'], r['timestamp'])
+    _, stages['write_post_bundle'] = timed_each(
+        lambda r: write_post_bundle(content_dir / r['dirname'], r['frontmatter'],
+                                    r['content'], r['media_files']),
+        rendered)
+
+    documents = [r['frontmatter'] + r['content'] for r in rendered]
+    _, stages['classify_post'] = timed_each(classify_post, documents)
+    _, stages['contains_publisher_url'] = timed_each(contains_publisher_url, documents)
+
+    return {
+        'revision': git_revision(),
+        'python': sys.version.split()[0],
+        'config': {
+            'posts': args.posts,
+            'media_ratio': args.media_ratio,
+            'link_ratio': args.link_ratio,
+            'place_ratio': args.place_ratio,
+            'image_size': args.image_size,
+            'image_count': args.image_count,
+            'seed': args.seed,
+        },
+        'stages': stages,
+        'publisher_matcher': benchmark_publisher_matcher(args.matcher_posts) if args.matcher_posts else None,
+        'memory': measure_post_memory(json_path),
+        'peak_rss_mb': peak_rss_mb(),
+    }
+
+
+def parse_args(argv: list[str] = None) -> argparse.Namespace:
+    """コマンドライン引数を解析"""
+    parser = argparse.ArgumentParser(description='合成データで変換・分類の各段階を計測します')
+    parser.add_argument('--posts', type=int, default=10000, help='投稿数')
+    parser.add_argument('--media-ratio', type=float, default=0.3, help='画像付き投稿の割合')
+    parser.add_argument('--link-ratio', type=float, default=0.3, help='リンク付き投稿の割合')
+    parser.add_argument('--place-ratio', type=float, default=0.1, help='位置情報付き投稿の割合')
+    parser.add_argument('--image-size', type=int, default=64 * 1024, help='画像 1 枚のバイト数')
+    parser.add_argument('--image-count', type=int, default=200, help='画像ファイルの種類数')
+    parser.add_argument('--seed', type=int, default=0, help='乱数シード')
+    parser.add_argument('--matcher-posts', type=int, default=100_000, metavar='N',
+                        help='出版社 URL 判定の照合器と従来のループの比較に使う合成投稿数（0 なら省略）')
+    parser.add_argument('--workdir', type=Path, default=None,
+                        help='作業ディレクトリ（指定時は削除せずに残す）')
+    parser.add_argument('--output', default='-', help='結果の JSON の出力先（既定は標準出力）')
+    return parser.parse_args(argv)
+
+
+def main():
+    args = parse_args()
+
+    if args.workdir:
+        args.workdir.mkdir(parents=True, exist_ok=True)
+        result = run_benchmark(args, args.workdir)
+    else:
+        with tempfile.TemporaryDirectory(prefix='fb-bench-') as tmp:
+            result = run_benchmark(args, Path(tmp))
+
+    text = json.dumps(result, ensure_ascii=False, indent=2)
+    if args.output == '-':
+        print(text)
+    else:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text + '\n')
+    return 0
+
+
+if __name__ == '__main__':
+    exit(main())
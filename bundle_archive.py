@@ -0,0 +1,276 @@
+#!/usr/bin/env python3
+"""
+Page Bundle をまとめた 1 つのアーカイブ（tar / tar.gz / zip）の書き出し・読み込み・展開
+
+小さなファイルを大量に作るのが遅いドライブ（WSL の /mnt/g など）では、
+convert.py --archive でアーカイブに書き出し、速いローカルディスク上で展開する。
+アーカイブ内の投稿は展開せずに classify_books.py / review_posts.py から読める。
+
+使い方:
+  python bundle_archive.py list posts.tar
+  python bundle_archive.py extract posts.tar [展開先]
+"""
+
+import argparse
+import io
+import os
+import tarfile
+import threading
+import time
+import zipfile
+from pathlib import Path, PurePosixPath
+from typing import Iterator
+
+# 展開先の既定値（リポジトリ内の Hugo の記事ディレクトリ）
+DEFAULT_EXTRACT_DIR = Path(__file__).parent / 'hugo-blog' / 'content' / 'posts'
+
+# zip の日時は 1980 年以降しか表せない
+_ZIP_MIN_DATE = (1980, 1, 1, 0, 0, 0)
+
+
+def archive_mode(path: Path) -> str:
+    """拡張子からアーカイブの形式を判定する（'zip', 'tar', 'tar:gz'）"""
+    name = str(path).lower()
+    if name.endswith('.zip'):
+        return 'zip'
+    if name.endswith(('.tar.gz', '.tgz')):
+        return 'tar:gz'
+    if name.endswith('.tar'):
+        return 'tar'
+    raise ValueError(f"対応していないアーカイブ形式です（.tar / .tar.gz / .tgz / .zip）: {path}")
+
+
+class ArchiveSink:
+    """
+    Page Bundle をアーカイブに順に書き出す
+    書き込み中は一時ファイルに出力し、close() で置き換える
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.mode = archive_mode(self.path)
+        self._tmp_path = self.path.with_name(self.path.name + '.tmp')
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        if self.mode == 'zip':
+            # 1980 年より前の日時のファイルは 1980-01-01 として書き出す
+            self._zip = zipfile.ZipFile(self._tmp_path, 'w', zipfile.ZIP_STORED,
+                                        strict_timestamps=False)
+            self._tar = None
+        else:
+            self._zip = None
+            self._tar = tarfile.open(self._tmp_path, 'w:gz' if self.mode == 'tar:gz' else 'w',
+                                     format=tarfile.PAX_FORMAT)
+        self._lock = threading.Lock()
+        self._names = set()
+        self._start = time.perf_counter()
+        self.stats = {'bundles': 0, 'files': 0, 'bytes': 0}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+        return False
+
+    def _add(self, arcname: str, data: bytes, mtime: float):
+        if self._zip is not None:
+            date_time = max(time.localtime(mtime)[:6], _ZIP_MIN_DATE)
+            self._zip.writestr(zipfile.ZipInfo(arcname, date_time), data)
+        else:
+            info = tarfile.TarInfo(arcname)
+            info.size = len(data)
+            info.mtime = int(mtime)
+            info.mode = 0o644
+            self._tar.addfile(info, io.BytesIO(data))
+        self.stats['files'] += 1
+        self.stats['bytes'] += len(data)
+
+    def _add_file(self, arcname: str, src_path: str):
+        """ファイルを読み込まずに少しずつ書き出す（大きな動画でもメモリに載せない）"""
+        st = os.stat(src_path)
+        if self._zip is not None:
+            self._zip.write(src_path, arcname)
+        else:
+            info = tarfile.TarInfo(arcname)
+            info.size = st.st_size
+            info.mtime = int(st.st_mtime)
+            info.mode = 0o644
+            with open(src_path, 'rb') as f:
+                self._tar.addfile(info, f)
+        self.stats['files'] += 1
+        self.stats['bytes'] += st.st_size
+
+    def add_bundle(
+        self,
+        dirname: str,
+        article: bytes,
+        media_files: list[tuple[str, str]] = (),
+        mtime: float = None
+    ) -> bool:
+        """Page Bundle 1 件（index.md とメディア）を書き出す。同名の Bundle があれば False"""
+        if mtime is None:
+            mtime = time.time()
+        with self._lock:
+            if dirname in self._names:
+                return False
+            self._names.add(dirname)
+            added = set()
+            for src_path, filename in media_files:
+                if filename in added or not os.path.exists(src_path):
+                    continue
+                added.add(filename)
+                self._add_file(f"{dirname}/{filename}", src_path)
+            self._add(f"{dirname}/index.md", article, mtime)
+            self.stats['bundles'] += 1
+        return True
+
+    def close(self):
+        """アーカイブを閉じて出力先に置き換える"""
+        if self._zip is not None:
+            self._zip.close()
+        else:
+            self._tar.close()
+        os.replace(self._tmp_path, self.path)
+
+    def abort(self):
+        """書き込み途中のアーカイブを破棄する（閉じるのに失敗しても一時ファイルは消す）"""
+        try:
+            if self._zip is not None:
+                self._zip.close()
+            else:
+                self._tar.close()
+        finally:
+            if self._tmp_path.exists():
+                self._tmp_path.unlink()
+
+    def summary(self) -> str:
+        """実行結果の概要"""
+        st = self.stats
+        elapsed = time.perf_counter() - self._start
+        rate = st['files'] / elapsed if elapsed else 0.0
+        return (f"{self.path} に {st['bundles']} 件 ({st['files']} ファイル, "
+                f"{st['bytes'] / (1 << 20):.1f} MB, {rate:.0f} files/s)")
+
+
+class BundleArchive:
+    """
+    アーカイブ内の Page Bundle を展開せずに読む
+    tar は開くときにメンバーを先頭から 1 回だけ走査して index.md を読んでおく
+    （tar.gz は前のメンバーに戻って読むたびに先頭から展開し直すため）
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.mode = archive_mode(self.path)
+        self._lock = threading.Lock()
+        # Bundle 名 → index.md（zip はメンバー、tar は読み込んだ内容）
+        self._articles = {}
+        if self.mode == 'zip':
+            self._zip = zipfile.ZipFile(self.path)
+            for info in self._zip.infolist():
+                name = self._bundle_name(info.filename)
+                if name is not None:
+                    self._articles[name] = info
+        else:
+            self._zip = None
+            with tarfile.open(self.path) as tar:
+                for member in tar:
+                    name = self._bundle_name(member.name)
+                    if name is not None and member.isfile():
+                        self._articles[name] = tar.extractfile(member).read()
+
+    @staticmethod
+    def _bundle_name(arcname: str) -> str:
+        """'<Bundle 名>/index.md' なら Bundle 名、それ以外は None"""
+        parts = PurePosixPath(arcname).parts
+        if len(parts) == 2 and parts[1] == 'index.md':
+            return parts[0]
+        return None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+    def close(self):
+        if self._zip is not None:
+            self._zip.close()
+
+    def names(self) -> list[str]:
+        """index.md を持つ Bundle 名を名前順に返す"""
+        return sorted(self._articles)
+
+    def read_index(self, name: str) -> str:
+        """Bundle の index.md を返す（存在しなければ空文字列）"""
+        data = self._articles.get(name)
+        if data is None:
+            return ""
+        if self._zip is not None:
+            with self._lock:
+                data = self._zip.read(data)
+        return data.decode('utf-8')
+
+    def iter_bundles(self) -> Iterator[tuple[str, str]]:
+        """(Bundle 名, index.md の内容) を名前順に返す"""
+        for name in self.names():
+            yield name, self.read_index(name)
+
+
+def extract_archive(path: Path, dest_dir: Path) -> int:
+    """アーカイブを dest_dir に展開し、展開したファイル数を返す"""
+    dest_dir = Path(dest_dir)
+    dest_dir.mkdir(parents=True, exist_ok=True)
+    root = dest_dir.resolve()
+
+    if archive_mode(path) == 'zip':
+        with zipfile.ZipFile(path) as zf:
+            members = [info for info in zf.infolist() if not info.is_dir()]
+            for info in members:
+                # アーカイブ外へのパスは拒否する
+                target = (root / info.filename).resolve()
+                if root not in target.parents:
+                    raise ValueError(f"不正なパスが含まれています: {info.filename}")
+            zf.extractall(dest_dir, members)
+        return len(members)
+
+    with tarfile.open(path) as tf:
+        members = [member for member in tf.getmembers() if member.isfile()]
+        if hasattr(tarfile, 'data_filter'):
+            tf.extractall(dest_dir, members, filter='data')
+        else:
+            for member in members:
+                target = (root / member.name).resolve()
+                if root not in target.parents:
+                    raise ValueError(f"不正なパスが含まれています: {member.name}")
+            tf.extractall(dest_dir, members)
+    return len(members)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Page Bundle のアーカイブを一覧・展開します')
+    parser.add_argument('command', choices=('list', 'extract'))
+    parser.add_argument('archive', type=Path, help='アーカイブ（.tar / .tar.gz / .tgz / .zip）')
+    parser.add_argument('dest', type=Path, nargs='?', default=DEFAULT_EXTRACT_DIR,
+                        help=f'展開先（既定: {DEFAULT_EXTRACT_DIR}）')
+    args = parser.parse_args()
+
+    if args.command == 'list':
+        with BundleArchive(args.archive) as archive:
+            for name in archive.names():
+                print(name)
+        return 0
+
+    start = time.perf_counter()
+    count = extract_archive(args.archive, args.dest)
+    elapsed = time.perf_counter() - start
+    print(f"{count} ファイルを {args.dest} に展開しました ({elapsed:.1f} 秒)")
+    return 0
+
+
+if __name__ == '__main__':
+    exit(main())
@@ -3,11 +3,18 @@
 書籍に関する感想・批評で投稿を振り分けるスクリプト
 """
 
+import argparse
+import hashlib
+import json
 import os
 import re
-import shutil
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 
+from bundle_archive import BundleArchive
+from corpus_index import CorpusIndex
+from move_planner import MovePlan
+
 
 # 書籍関連の確実なキーワード（これらが含まれれば書籍関連と判定）
 DEFINITE_BOOK_PATTERNS = [
@@ -66,6 +73,201 @@ EXCLUDE_PATTERNS = [
 ]
 
 
+class PatternGroup:
+    """
+    パターン群を事前にコンパイルして照合する
+
+    照合の速さは re.search(pattern_str, ...) を 1 つずつ呼ぶ従来の処理とほぼ同じで、
+    パターンごとの一致結果（classify_detail・classify_incremental）を扱うために使う。
+    1 つの選択パターンにまとめる方式は CPython の正規表現エンジンでは各位置で全候補を
+    試すことになり、リテラル接頭辞による高速検索も効かなくなって遅くなるため、
+    個別パターンのまま照合する。
+    """
+
+    def __init__(self, patterns: list[str]):
+        self.patterns = list(patterns)
+        self.compiled = [re.compile(p, re.IGNORECASE) for p in self.patterns]
+        self.by_pattern = dict(zip(self.patterns, self.compiled))
+
+    def search(self, content: str) -> bool:
+        """いずれかのパターンに一致するか（最初の一致で打ち切る）"""
+        for regex in self.compiled:
+            if regex.search(content):
+                return True
+        return False
+
+    def hits(self, content: str) -> set[int]:
+        """一致したパターンの番号の集合"""
+        return {i for i, regex in enumerate(self.compiled) if regex.search(content)}
+
+
+class ClassifierEngine:
+    """DEFINITE / SUSPICIOUS / EXCLUDE の各パターン群をまとめて照合する分類器"""
+
+    def __init__(self, definite: list[str], suspicious: list[str], exclude: list[str]):
+        self.definite = PatternGroup(definite)
+        self.suspicious = PatternGroup(suspicious)
+        self.exclude = PatternGroup(exclude)
+
+    @staticmethod
+    def verdict(definite_count: int, suspicious_count: int, exclude_count: int) -> str:
+        """各パターン群の一致数から分類結果を決める"""
+        if definite_count:
+            return 'definite'
+        # 疑わしいパターンが2つ以上あり、除外パターンより多ければ suspicious
+        if suspicious_count >= 2 and suspicious_count > exclude_count:
+            return 'suspicious'
+        return 'nonpublish'
+
+    def classify(self, content: str) -> str:
+        """分類結果だけを返す（判定に不要な照合は省略する）"""
+        if self.definite.search(content):
+            return 'definite'
+        suspicious_count = len(self.suspicious.hits(content))
+        if suspicious_count < 2:
+            return 'nonpublish'
+        return self.verdict(0, suspicious_count, len(self.exclude.hits(content)))
+
+    def classify_detail(self, content: str) -> tuple[str, dict[str, list[str]]]:
+        """分類結果と、パターン群ごとに一致したパターンを返す"""
+        hits = {}
+        for name, group in (('definite', self.definite),
+                            ('suspicious', self.suspicious),
+                            ('exclude', self.exclude)):
+            hits[name] = [group.patterns[i] for i in sorted(group.hits(content))]
+        verdict = self.verdict(len(hits['definite']), len(hits['suspicious']), len(hits['exclude']))
+        return verdict, hits
+
+    def classify_incremental(
+        self,
+        content: str,
+        known: dict[str, dict[str, bool]]
+    ) -> tuple[str, dict[str, list[str]], int]:
+        """
+        classify_detail と同じ結果を返すが、known（パターン群→{パターン: 一致したか}）に
+        結果があるパターンは照合を省略する
+        Returns: (分類結果, 一致したパターン, 実際に照合したパターン数)
+        """
+        hits = {}
+        evaluated = 0
+        for name, group in (('definite', self.definite),
+                            ('suspicious', self.suspicious),
+                            ('exclude', self.exclude)):
+            previous = known.get(name, {})
+            matched = []
+            for pattern in group.patterns:
+                hit = previous.get(pattern)
+                if hit is None:
+                    hit = group.by_pattern[pattern].search(content) is not None
+                    evaluated += 1
+                if hit:
+                    matched.append(pattern)
+            hits[name] = matched
+        verdict = self.verdict(len(hits['definite']), len(hits['suspicious']), len(hits['exclude']))
+        return verdict, hits, evaluated
+
+    def ruleset(self) -> dict[str, list[str]]:
+        """パターン群の一覧（キャッシュのキーに使う）"""
+        return {
+            'definite': self.definite.patterns,
+            'suspicious': self.suspicious.patterns,
+            'exclude': self.exclude.patterns,
+        }
+
+
+CLASSIFIER = ClassifierEngine(DEFINITE_BOOK_PATTERNS, SUSPICIOUS_BOOK_PATTERNS, EXCLUDE_PATTERNS)
+
+
+def ruleset_hash(ruleset: dict[str, list[str]]) -> str:
+    """パターン群一覧のハッシュ"""
+    data = json.dumps(ruleset, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(data.encode('utf-8')).hexdigest()
+
+
+class ClassificationCache:
+    """
+    分類結果のキャッシュ（index.md の内容ハッシュ → 一致したパターンと分類結果）
+
+    各エントリはどのパターン群一覧（ルールセット）で評価したかを持つ。
+    ルールセットが変わっても、以前と同じパターンの照合結果は再利用し、
+    追加・変更されたパターンだけを照合し直す。
+    """
+
+    VERSION = 1
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.rulesets = {}
+        self.posts = {}
+        self.verdicts = {}
+        if path.exists():
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('version') == self.VERSION:
+                self.rulesets = data.get('rulesets', {})
+                self.posts = data.get('posts', {})
+                self.verdicts = data.get('verdicts', {})
+
+    def known_hits(self, content_hash: str) -> tuple[str, dict[str, dict[str, bool]]]:
+        """キャッシュ済みの照合結果を (ルールセットのハッシュ, パターン群→{パターン: 一致したか}) で返す"""
+        entry = self.posts.get(content_hash)
+        if entry is None:
+            return None, {}
+        ruleset = self.rulesets.get(entry['ruleset'], {})
+        known = {}
+        for name, patterns in ruleset.items():
+            matched = set(entry['hits'].get(name, []))
+            known[name] = {pattern: pattern in matched for pattern in patterns}
+        return entry['ruleset'], known
+
+    def update(self, results: list[dict], ruleset: dict[str, list[str]], record_verdicts: bool = True) -> list[tuple[str, str, str]]:
+        """
+        分類結果をキャッシュに反映する
+        Returns: 前回から分類結果が変わった投稿の (投稿名, 前回, 今回) の一覧
+        """
+        current = ruleset_hash(ruleset)
+        self.rulesets[current] = ruleset
+        flipped = []
+        for result in results:
+            self.posts[result['hash']] = {
+                'ruleset': current,
+                'hits': result['hits'],
+                'verdict': result['verdict'],
+            }
+            previous = self.verdicts.get(result['post'])
+            if previous is not None and previous != result['verdict']:
+                flipped.append((result['post'], previous, result['verdict']))
+            if record_verdicts:
+                self.verdicts[result['post']] = result['verdict']
+
+        # どのエントリからも参照されないルールセットは捨てる
+        used = {entry['ruleset'] for entry in self.posts.values()}
+        self.rulesets = {h: r for h, r in self.rulesets.items() if h in used}
+        return flipped
+
+    def save(self):
+        """キャッシュを一時ファイル経由で書き出す"""
+        data = {
+            'version': self.VERSION,
+            'rulesets': self.rulesets,
+            'posts': self.posts,
+            'verdicts': self.verdicts,
+        }
+        tmp_path = self.path.with_name(self.path.name + '.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+
+
+# ワーカープロセスで参照するキャッシュ（classify_tree が設定する）
+_worker_cache = None
+
+
+def _init_worker(cache: ClassificationCache):
+    global _worker_cache
+    _worker_cache = cache
+
+
 def read_post_content(post_dir: Path) -> str:
     """投稿ディレクトリからコンテンツを読み取る"""
     index_path = post_dir / 'index.md'
@@ -81,76 +283,215 @@ def classify_post(content: str) -> str:
     投稿を分類する
     Returns: 'definite', 'suspicious', 'nonpublish'
     """
-    # 確実な書籍パターンをチェック
-    for pattern in DEFINITE_BOOK_PATTERNS:
-        if re.search(pattern, content, re.IGNORECASE):
-            return 'definite'
+    return CLASSIFIER.classify(content)
 
-    # 疑わしいパターンのカウント
-    suspicious_count = 0
-    for pattern in SUSPICIOUS_BOOK_PATTERNS:
-        if re.search(pattern, content, re.IGNORECASE):
-            suspicious_count += 1
 
-    # 除外パターンのカウント（書籍と関係ない「本」の使用など）
-    exclude_count = 0
-    for pattern in EXCLUDE_PATTERNS:
-        if re.search(pattern, content, re.IGNORECASE):
-            exclude_count += 1
+def classify_post_dir(post_dir: Path, content: str = None) -> dict:
+    """
+    投稿ディレクトリ 1 件を分類する（ワーカープロセスで実行される）
+    content を渡した場合（索引から取得済み）は index.md を読まない
+    """
+    if content is None:
+        content = read_post_content(post_dir)
+    content_hash = hashlib.sha256(content.encode('utf-8')).hexdigest()
 
-    # 疑わしいパターンが2つ以上あり、除外パターンより多ければ suspicious
-    if suspicious_count >= 2 and suspicious_count > exclude_count:
-        return 'suspicious'
+    known = {}
+    if _worker_cache is not None:
+        cached_ruleset, known = _worker_cache.known_hits(content_hash)
+        if cached_ruleset == ruleset_hash(CLASSIFIER.ruleset()):
+            # 同じ内容を同じルールセットで分類済み
+            entry = _worker_cache.posts[content_hash]
+            return {
+                'post': post_dir.name,
+                'path': str(post_dir),
+                'hash': content_hash,
+                'verdict': entry['verdict'],
+                'hits': entry['hits'],
+                'evaluated': 0,
+            }
 
-    return 'nonpublish'
+    verdict, hits, evaluated = CLASSIFIER.classify_incremental(content, known)
+    return {
+        'post': post_dir.name,
+        'path': str(post_dir),
+        'hash': content_hash,
+        'verdict': verdict,
+        'hits': hits,
+        'evaluated': evaluated,
+    }
 
 
-def main():
-    base_dir = Path('/mnt/g/temp/facebook-kamiyn-2025_12_25-5XfLtXCH')
-    source_dir = base_dir / 'hugo-blog-content-candidate'
+def classify_tree(
+    source_dir: Path,
+    jobs: int = None,
+    quiet: bool = False,
+    cache: ClassificationCache = None,
+    index: CorpusIndex = None,
+    archive: BundleArchive = None
+) -> list[dict]:
+    """
+    source_dir 直下の投稿ディレクトリをプロセスプールで分類する
+    この段階ではファイルの移動は一切行わない
+    cache を指定すると、内容とパターンが変わっていない照合は省略する
+    index を指定すると、ディレクトリを走査せず索引にある投稿と本文を使う
+    archive を指定すると、アーカイブ内の投稿を展開せずに読む（source_dir は結果のパスにのみ使う）
+    """
+    if index is not None or archive is not None:
+        rows = list(archive.iter_bundles()) if archive is not None else index.posts_in(source_dir)
+        post_dirs = [source_dir / slug for slug, _ in rows]
+        contents = [body for _, body in rows]
+    else:
+        post_dirs = sorted(d for d in source_dir.iterdir() if d.is_dir())
+        contents = [None] * len(post_dirs)
+    total = len(post_dirs)
+    if not quiet:
+        print(f"処理開始: {total} 件の投稿")
+
+    results = []
+    if jobs == 1:
+        _init_worker(cache)
+        mapped = map(classify_post_dir, post_dirs, contents)
+        executor = None
+    else:
+        executor = ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker, initargs=(cache,))
+        mapped = executor.map(classify_post_dir, post_dirs, contents, chunksize=64)
+
+    try:
+        for i, result in enumerate(mapped):
+            results.append(result)
+            if not quiet and (i + 1) % 500 == 0:
+                print(f"  {i + 1}/{total} 件分類完了...")
+    finally:
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+        else:
+            _init_worker(None)
+
+    return results
 
-    # 出力ディレクトリ（同じ場所を使用）
-    definite_dir = base_dir / 'hugo-blog-content-candidate'
-    suspicious_dir = base_dir / 'hugo-blog-content-suspicious-candidate'
-    nonpublish_dir = base_dir / 'hugo-blog-content-nonpublish'
 
-    # 出力ディレクトリを作成
+def apply_classification(
+    results: list[dict],
+    suspicious_dir: Path,
+    nonpublish_dir: Path,
+    index: CorpusIndex = None,
+    jobs: int = 4
+) -> dict:
+    """
+    分類結果に従って投稿ディレクトリを移動する
+    移動はまとめて計画し、同じファイルシステム内は rename、異なる場合は jobs 並列のコピーで行う
+    index を指定すると、分類結果と移動先を索引にも記録する
+    """
     suspicious_dir.mkdir(exist_ok=True)
     nonpublish_dir.mkdir(exist_ok=True)
 
-    # 統計
     stats = {'definite': 0, 'suspicious': 0, 'nonpublish': 0}
+    plan = MovePlan(jobs)
+    for result in results:
+        classification = result['verdict']
+        post_dir = Path(result['path'])
+        stats[classification] += 1
+        if index is not None:
+            index.set_verdict(post_dir.name, classification)
 
-    # 全投稿を処理
-    posts = list(source_dir.iterdir())
-    total = len(posts)
+        # 移動先を決定（definite はそのまま残す）
+        if classification == 'definite':
+            continue
+        dest_dir = suspicious_dir if classification == 'suspicious' else nonpublish_dir
+        if post_dir.exists() and not (dest_dir / post_dir.name).exists():
+            plan.add(post_dir, dest_dir)
 
-    print(f"処理開始: {total} 件の投稿")
+    if plan:
+        print(plan.describe())
+        on_moved = None
+        if index is not None:
+            on_moved = lambda src, dest_dir: index.set_location(src.name, dest_dir)
+        plan.execute(on_moved)
+        print(f"  {plan.summary()}")
 
-    for i, post_dir in enumerate(posts):
-        if not post_dir.is_dir():
-            continue
+    return stats
 
-        content = read_post_content(post_dir)
-        classification = classify_post(content)
 
-        # 移動先を決定
-        if classification == 'definite':
-            # そのまま残す
-            stats['definite'] += 1
-        elif classification == 'suspicious':
-            dest = suspicious_dir / post_dir.name
-            if not dest.exists():
-                shutil.move(str(post_dir), str(dest))
-            stats['suspicious'] += 1
-        else:
-            dest = nonpublish_dir / post_dir.name
-            if not dest.exists():
-                shutil.move(str(post_dir), str(dest))
-            stats['nonpublish'] += 1
+def write_verdicts(results: list[dict], output: str):
+    """分類結果を JSONL で書き出す（'-' なら標準出力）"""
+    if output == '-':
+        for result in results:
+            print(json.dumps(result, ensure_ascii=False))
+        return
+    with open(output, 'w', encoding='utf-8') as f:
+        for result in results:
+            f.write(json.dumps(result, ensure_ascii=False) + '\n')
+
+
+def parse_args(argv: list[str] = None) -> argparse.Namespace:
+    """コマンドライン引数を解析"""
+    parser = argparse.ArgumentParser(description='書籍に関する投稿を振り分けます')
+    parser.add_argument('--base-dir', type=Path,
+                        default=Path('/mnt/g/temp/facebook-kamiyn-2025_12_25-5XfLtXCH'),
+                        help='hugo-blog-content-candidate などを含むディレクトリ')
+    parser.add_argument('--jobs', type=int, default=None, metavar='N',
+                        help='分類を N プロセスで行う（既定は CPU 数）。'
+                             '別のファイルシステムへの移動も N 並列で行う（既定は 4）')
+    parser.add_argument('--dry-run', nargs='?', const='-', default=None, metavar='PATH',
+                        help='移動は行わず、分類結果を JSONL で PATH（省略時は標準出力）に書き出す')
+    parser.add_argument('--index', type=Path, default=None, metavar='PATH',
+                        help='ディレクトリを走査せず、コーパス索引（convert.py --index）の投稿を分類する')
+    parser.add_argument('--archive', type=Path, default=None, metavar='PATH',
+                        help='convert.py --archive で書き出したアーカイブ内の投稿を分類する'
+                             '（移動は行わず、--dry-run と同様に分類結果を書き出す）')
+    parser.add_argument('--no-cache', action='store_true',
+                        help='分類キャッシュ（BASE_DIR/.classify-cache.json）を使わない')
+    return parser.parse_args(argv)
+
+
+def main():
+    args = parse_args()
+
+    base_dir = args.base_dir
+    source_dir = base_dir / 'hugo-blog-content-candidate'
+
+    # 出力ディレクトリ（同じ場所を使用）
+    definite_dir = base_dir / 'hugo-blog-content-candidate'
+    suspicious_dir = base_dir / 'hugo-blog-content-suspicious-candidate'
+    nonpublish_dir = base_dir / 'hugo-blog-content-nonpublish'
+
+    # アーカイブ内の投稿は移動できないので分類結果の出力だけを行う
+    archive = BundleArchive(args.archive) if args.archive else None
+    if archive is not None and not args.dry_run:
+        args.dry_run = '-'
+
+    # 分類フェーズ（並列、ファイルの移動なし）
+    quiet = args.dry_run == '-'
+    cache = None if args.no_cache else ClassificationCache(base_dir / '.classify-cache.json')
+    index = CorpusIndex(args.index) if args.index else None
+    results = classify_tree(source_dir, args.jobs, quiet=quiet, cache=cache, index=index,
+                            archive=archive)
+    if archive is not None:
+        archive.close()
+
+    if cache is not None:
+        # ドライランでは照合結果だけを保存し、分類結果の履歴は更新しない
+        flipped = cache.update(results, CLASSIFIER.ruleset(), record_verdicts=not args.dry_run)
+        cache.save()
+        if not quiet:
+            evaluated = sum(r['evaluated'] for r in results)
+            reused = sum(1 for r in results if r['evaluated'] == 0)
+            print(f"  キャッシュ再利用: {reused} 件 / 照合したパターン: {evaluated} 個")
+            if flipped:
+                print(f"  分類結果が変わった投稿: {len(flipped)} 件")
+                for name, before, after in flipped:
+                    print(f"    {name}: {before} → {after}")
+
+    if args.dry_run:
+        write_verdicts(results, args.dry_run)
+        if index is not None:
+            index.close()
+        return 0
 
-        if (i + 1) % 500 == 0:
-            print(f"  {i + 1}/{total} 件処理完了...")
+    # 移動フェーズ（まとめて計画し、rename またはコピーで移動）
+    stats = apply_classification(results, suspicious_dir, nonpublish_dir, index, args.jobs or 4)
+    if index is not None:
+        index.close()
 
     print(f"\n完了!")
     print(f"  確実に書籍関連: {stats['definite']} 件 (hugo-blog-content-candidate/)")
@@ -159,4 +500,4 @@ def main():
 
 
 if __name__ == '__main__':
-    main()
+    exit(main())
@@ -3,18 +3,81 @@
 Facebook JSON データを Hugo ブログ記事に変換するスクリプト
 """
 
+import argparse
+import hashlib
+import heapq
 import json
 import os
-import shutil
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
 from datetime import datetime
+from functools import lru_cache
+from itertools import islice
 from pathlib import Path
+from typing import Callable, Iterable, Iterator
 import re
 
+import profiling
+from bundle_archive import ArchiveSink
+from classify_books import classify_post
+from corpus_index import CorpusIndex, extract_urls
+from media_store import MEDIA_STRATEGIES, MediaStore, materialize_media
+from profiling import Profiler, stage
+from review_posts import find_publisher_domain, find_publisher_domains
+
+# 投稿 JSON のファイル名（大きなエクスポートは _1, _2, ... に分割される）
+POSTS_JSON_GLOB = 'your_posts__check_ins__photos_and_videos_*.json'
+
+# 複数のエクスポートを読むとき、投稿ごとのメディアの基準ディレクトリを入れるキー
+SOURCE_BASE_KEY = '_source_base'
+
+# ストリーミング読み込み時に一度に読むバイト数（文字数）
+STREAM_CHUNK_SIZE = 1 << 16
+
+# 増分変換用マニフェストのファイル名（出力ディレクトリ直下に置く）
+MANIFEST_FILENAME = '.convert-manifest.json'
+MANIFEST_VERSION = 1
+
+# decode_facebook_text の結果を保持する文字列の長さの上限と件数
+DECODE_CACHE_MAX_LENGTH = 256
+DECODE_CACHE_SIZE = 8192
+
+# 本文中のハッシュタグ（URL のフラグメントなど直前が空白でないものは除く）
+HASHTAG_PATTERN = re.compile(r'(?<!\S)#(\w+)')
+
+# URL 中の ISBN-13（978 / 979 で始まる 13 桁。ハイフン区切りも許す）
+ISBN13_PATTERN = re.compile(r'(?<!\d)97[89](?:-?\d){10}(?!\d)')
+
+# 記事の配置（flat: content/posts 直下、year-month: content/posts/YYYY/MM 以下）
+LAYOUTS = ('flat', 'year-month')
+
+# --layout year-month で書き出す Hugo のセグメント設定（出力ディレクトリからの相対パス）
+SEGMENTS_CONFIG = Path('config') / '_default' / 'segments.toml'
+
+# 計測時に呼び出しごとの時間を記録する補助関数
+PROFILED_FUNCTIONS = (
+    'decode_facebook_text', 'sanitize_filename', 'parse_post', 'extract_attachments',
+    'render_post', 'write_post_bundle',
+)
+
 
 def decode_facebook_text(text: str) -> str:
     """Facebook JSON のエスケープされた UTF-8 を正しくデコード"""
     if not text:
         return ""
+    # ASCII のみなら変換しても同じ文字列になる
+    if text.isascii():
+        return text
+    # 地名やリンク名など繰り返し現れる短い文字列は結果を使い回す
+    if len(text) <= DECODE_CACHE_MAX_LENGTH:
+        return _decode_facebook_text_cached(text)
+    return _decode_facebook_text(text)
+
+
+def _decode_facebook_text(text: str) -> str:
     try:
         # Facebook は Latin-1 としてエンコードされた UTF-8 バイトを出力する
         return text.encode('latin-1').decode('utf-8')
@@ -22,6 +85,9 @@ def decode_facebook_text(text: str) -> str:
         return text
 
 
+_decode_facebook_text_cached = lru_cache(maxsize=DECODE_CACHE_SIZE)(_decode_facebook_text)
+
+
 def sanitize_filename(text: str) -> str:
     """ファイル名として使える文字列に変換"""
     # 改行とタブを空白に
@@ -51,7 +117,104 @@ def extract_post_content(post: dict) -> str:
     return content
 
 
-def extract_attachments(post: dict) -> list[dict]:
+class MediaAttachment:
+    """画像・動画の添付"""
+
+    __slots__ = ('uri', 'description', 'title')
+
+    def __init__(self, uri: str, description: str = "", title: str = ""):
+        self.uri = uri
+        self.description = description
+        self.title = title
+
+    def render(self, source_base: Path, media_files: list[tuple[str, str]]) -> str:
+        """マークダウンに変換し、コピー対象のメディアを media_files に加える"""
+        if not self.uri:
+            return ""
+        # メディアファイルのパスを取得
+        media_path = source_base / self.uri
+        with stage('media_exists'):
+            media_exists = media_path.exists()
+        if not media_exists:
+            return ""
+        filename = os.path.basename(self.uri)
+        media_files.append((str(media_path), filename))
+        return f"\n![{self.description}]({filename})\n"
+
+
+class LinkAttachment:
+    """外部リンクの添付"""
+
+    __slots__ = ('url', 'name')
+
+    def __init__(self, url: str, name: str = ""):
+        self.url = url
+        self.name = name
+
+    def render(self, source_base: Path, media_files: list[tuple[str, str]]) -> str:
+        if not self.url:
+            return ""
+        return f"\n[{self.name or self.url}]({self.url})\n"
+
+
+class PlaceAttachment:
+    """位置情報の添付"""
+
+    __slots__ = ('name', 'address')
+
+    def __init__(self, name: str, address: str = ""):
+        self.name = name
+        self.address = address
+
+    def render(self, source_base: Path, media_files: list[tuple[str, str]]) -> str:
+        if not self.name:
+            return ""
+        if self.address:
+            return f"\n📍 {self.name} ({self.address})\n"
+        return f"\n📍 {self.name}\n"
+
+
+class Post:
+    """
+    変換に使う投稿 1 件（本文と添付はデコード済み）
+    生の JSON の入れ子の dict は保持しない
+    """
+
+    __slots__ = ('timestamp', 'text', 'attachments', 'source_base')
+
+    def __init__(
+        self,
+        timestamp: int,
+        text: str = "",
+        attachments: tuple = (),
+        source_base: str = None
+    ):
+        self.timestamp = timestamp
+        self.text = text
+        self.attachments = attachments
+        # 複数のエクスポートを読む場合のメディアの基準ディレクトリ
+        self.source_base = source_base
+
+
+def parse_post(raw: dict) -> Post:
+    """生の投稿 JSON から Post を作る（本文と添付を 1 回ずつデコードする）"""
+    return Post(
+        raw.get('timestamp'),
+        extract_post_content(raw),
+        # タプルは余分な領域を確保せず、添付がなければ共有の空タプルになる
+        tuple(extract_attachments(raw)),
+        raw.get(SOURCE_BASE_KEY),
+    )
+
+
+def parse_posts(raws: list[dict]) -> list[Post]:
+    """読み込んだ投稿の一覧をその場で Post に置き換える（生の dict から順に解放される）"""
+    for i, raw in enumerate(raws):
+        raws[i] = parse_post(raw)
+    return raws
+
+
+def extract_attachments(post: dict) -> list:
     """投稿から添付ファイル情報を抽出"""
     attachments = []
     if 'attachments' not in post:
@@ -63,31 +226,36 @@ def extract_attachments(post: dict) -> list[dict]:
         for data in att['data']:
             if 'media' in data:
                 media = data['media']
-                attachments.append({
-                    'type': 'media',
-                    'uri': media.get('uri', ''),
-                    'description': decode_facebook_text(media.get('description', '')),
-                    'title': decode_facebook_text(media.get('title', ''))
-                })
+                attachments.append(MediaAttachment(
+                    media.get('uri', ''),
+                    decode_facebook_text(media.get('description', '')),
+                    decode_facebook_text(media.get('title', ''))
+                ))
             elif 'external_context' in data:
                 ext = data['external_context']
-                attachments.append({
-                    'type': 'link',
-                    'url': ext.get('url', ''),
-                    'name': decode_facebook_text(ext.get('name', ''))
-                })
+                attachments.append(LinkAttachment(
+                    ext.get('url', ''),
+                    decode_facebook_text(ext.get('name', ''))
+                ))
             elif 'place' in data:
                 place = data['place']
-                attachments.append({
-                    'type': 'place',
-                    'name': decode_facebook_text(place.get('name', '')),
-                    'address': decode_facebook_text(place.get('address', ''))
-                })
+                attachments.append(PlaceAttachment(
+                    decode_facebook_text(place.get('name', '')),
+                    decode_facebook_text(place.get('address', ''))
+                ))
     return attachments
 
 
-def generate_hugo_frontmatter(date_iso: str, title: str, tags: list[str] = None) -> str:
-    """Hugo のフロントマターを生成"""
+def generate_hugo_frontmatter(
+    date_iso: str,
+    title: str,
+    tags: list[str] = None,
+    params: dict = None
+) -> str:
+    """
+    Hugo のフロントマターを生成
+    params の値（文字列またはリスト）は JSON 形式で書き出す（YAML としても有効）
+    """
     tags = tags or []
     frontmatter = f'''---
 title: "{title}"
@@ -96,37 +264,59 @@ draft: false
 '''
     if tags:
         frontmatter += f"tags: {tags}\n"
+    for key, value in (params or {}).items():
+        if value:
+            frontmatter += f"{key}: {json.dumps(value, ensure_ascii=False)}\n"
     frontmatter += "---\n\n"
     return frontmatter
 
 
-def generate_hugo_content(post: dict, media_dest_dir: Path, source_base: Path) -> tuple[str, str, list[str]]:
+def is_valid_isbn13(digits: str) -> bool:
+    """ISBN-13 のチェックディジットを検証"""
+    if len(digits) != 13 or not digits.isdigit():
+        return False
+    total = sum(int(d) * (3 if i % 2 else 1) for i, d in enumerate(digits))
+    return total % 10 == 0
+
+
+def extract_isbns(urls: list[str]) -> list[str]:
+    """URL（出版社の書籍ページなど）から ISBN-13 を出現順に重複なく取り出す"""
+    isbns = []
+    for url in urls:
+        for match in ISBN13_PATTERN.findall(url):
+            digits = match.replace('-', '')
+            if is_valid_isbn13(digits) and digits not in isbns:
+                isbns.append(digits)
+    return isbns
+
+
+def extract_hashtags(content: str) -> list[str]:
+    """本文中のハッシュタグを出現順に重複なく取り出す"""
+    return list(dict.fromkeys(HASHTAG_PATTERN.findall(content)))
+
+
+def enrich_frontmatter(content: str, verdict: str) -> tuple[list[str], dict]:
+    """
+    本文からタグ・出版社・ISBN を取り出し、分類結果とともにフロントマターの項目にする
+    Returns: (タグ, その他の項目)
+    """
+    params = {
+        'publishers': find_publisher_domains(content),
+        'books': extract_isbns(extract_urls(content)),
+        'classification': verdict,
+    }
+    return extract_hashtags(content), params
+
+
+def generate_hugo_content(post: Post, media_dest_dir: Path, source_base: Path) -> tuple[str, str, list[str]]:
     """Hugo 記事のコンテンツを生成"""
-    content = extract_post_content(post)
-    attachments = extract_attachments(post)
+    content = post.text
 
     # 画像ファイルのリスト（コピー対象）
     media_files = []
 
     # 添付ファイルをマークダウンに変換
-    attachment_md = ""
-    for att in attachments:
-        if att['type'] == 'media' and att['uri']:
-            uri = att['uri']
-            # メディアファイルのパスを取得
-            media_path = source_base / uri
-            if media_path.exists():
-                filename = os.path.basename(uri)
-                media_files.append((str(media_path), filename))
-                attachment_md += f"\n![{att.get('description', '')}]({filename})\n"
-        elif att['type'] == 'link' and att['url']:
-            link_text = att.get('name') or att['url']
-            attachment_md += f"\n[{link_text}]({att['url']})\n"
-        elif att['type'] == 'place' and att['name']:
-            place_info = att['name']
-            if att.get('address'):
-                place_info += f" ({att['address']})"
-            attachment_md += f"\n📍 {place_info}\n"
+    attachment_md = "".join(att.render(source_base, media_files) for att in post.attachments)
 
     # タイトルを生成
     title = content[:100] if content else "Facebook投稿"
@@ -141,91 +331,992 @@ def generate_hugo_content(post: dict, media_dest_dir: Path, source_base: Path) -
 
 def load_facebook_posts(json_path: Path) -> list[dict]:
     """Facebook の投稿 JSON を読み込む"""
-    with open(json_path, 'r', encoding='utf-8') as f:
+    with stage('json_parse') as s, open(json_path, 'r', encoding='utf-8') as f:
+        s.add_file(json_path)
         return json.load(f)
 
 
+def iter_facebook_posts(json_path: Path, chunk_size: int = STREAM_CHUNK_SIZE) -> Iterator[dict]:
+    """
+    Facebook の投稿 JSON をトップレベル配列の要素ごとに読み込むジェネレータ
+    メモリ上に保持するのは読み込み途中の投稿 1 件分のバッファのみ
+    """
+    decoder = json.JSONDecoder()
+    with open(json_path, 'r', encoding='utf-8') as f:
+        buf = ''
+        pos = 0
+        eof = False
+
+        def fill() -> bool:
+            nonlocal buf, pos, eof
+            chunk = f.read(chunk_size)
+            if not chunk:
+                eof = True
+                return False
+            # 処理済みの部分を捨ててからバッファを伸ばす
+            buf = buf[pos:] + chunk
+            pos = 0
+            return True
+
+        def skip_whitespace() -> str:
+            nonlocal pos
+            while True:
+                while pos < len(buf) and buf[pos] in ' \t\r\n':
+                    pos += 1
+                if pos < len(buf):
+                    return buf[pos]
+                if not fill():
+                    return ''
+
+        if skip_whitespace() != '[':
+            raise ValueError(f"トップレベルが配列ではありません: {json_path}")
+        pos += 1
+
+        # json.load と同じく、要素の間の ',' を必須とし、末尾の ',' と配列の後のデータは拒否する
+        ch = skip_whitespace()
+        if ch == ']':
+            pos += 1
+        while ch != ']':
+            if not ch:
+                raise ValueError(f"JSON が途中で終わっています: {json_path}")
+
+            with stage('json_parse') as s:
+                while True:
+                    try:
+                        value, end = decoder.raw_decode(buf, pos)
+                    except json.JSONDecodeError:
+                        if eof or not fill():
+                            raise
+                        continue
+                    # バッファ末尾で切れた数値などを誤って確定させない
+                    if end >= len(buf) or buf[end] not in ' \t\r\n,]':
+                        if not eof and fill():
+                            continue
+                    break
+                s.add(end - pos)
+
+            pos = end
+            yield value
+
+            ch = skip_whitespace()
+            if ch == ',':
+                pos += 1
+                ch = skip_whitespace()
+                if ch == ']':
+                    raise ValueError(f"配列の末尾に ',' があります: {json_path}")
+            elif ch == ']':
+                pos += 1
+            elif ch:
+                raise ValueError(f"配列の要素の間に ',' がありません: {json_path}")
+
+        if skip_whitespace():
+            raise ValueError(f"配列の後に余分なデータがあります: {json_path}")
+
+
+def _shard_number(json_path: Path) -> int:
+    """分割ファイルの番号（your_posts_..._2.json なら 2）"""
+    m = re.search(r'_(\d+)\.json$', json_path.name)
+    return int(m.group(1)) if m else 0
+
+
+def discover_export_shards(paths: list[Path]) -> list[tuple[Path, Path]]:
+    """
+    エクスポート（展開したディレクトリ・your_facebook_activity・投稿 JSON のいずれか）から
+    投稿 JSON の分割ファイルをすべて探す
+    Returns: (投稿 JSON, メディアの基準ディレクトリ) の一覧（指定順、各エクスポート内は番号順）
+    """
+    shards = []
+    for path in paths:
+        path = Path(path)
+        if path.is_file():
+            shards.append((path, path.parent.parent))
+            continue
+        for source_base in (path / 'your_facebook_activity', path):
+            posts_dir = source_base / 'posts'
+            found = sorted(posts_dir.glob(POSTS_JSON_GLOB), key=_shard_number)
+            if found:
+                shards.extend((json_path, source_base) for json_path in found)
+                break
+    return shards
+
+
+class ShardReader(threading.Thread):
+    """分割ファイル 1 つを読み、投稿を上限付きのキューに入れるスレッド"""
+
+    _DONE = object()
+
+    def __init__(self, json_path: Path, source_base: Path, stop: threading.Event, queue_size: int):
+        super().__init__(daemon=True)
+        self.json_path = json_path
+        self.source_base = str(source_base)
+        self.stop = stop
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.error = None
+        # 新しい順に並んでいない投稿の件数（マージの順序が崩れる）
+        self.out_of_order = 0
+
+    def _put(self, item) -> bool:
+        while not self.stop.is_set():
+            try:
+                self.queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def run(self):
+        try:
+            last = None
+            for post in iter_facebook_posts(self.json_path):
+                timestamp = post.get('timestamp', 0)
+                if last is not None and timestamp > last:
+                    self.out_of_order += 1
+                last = timestamp
+                post[SOURCE_BASE_KEY] = self.source_base
+                if not self._put(post):
+                    return
+        except Exception as e:
+            self.error = e
+        finally:
+            self._put(self._DONE)
+
+    def __iter__(self) -> Iterator[dict]:
+        while True:
+            item = self.queue.get()
+            if item is self._DONE:
+                if self.error is not None:
+                    raise self.error
+                return
+            yield item
+
+
+def _post_identity(post: dict) -> str:
+    """重複判定に使う投稿内容のハッシュ（エクスポートごとに異なる基準ディレクトリは除く）"""
+    data = {key: value for key, value in post.items() if key != SOURCE_BASE_KEY}
+    return hashlib.sha256(json.dumps(data, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+def iter_merged_posts(
+    shards: list[tuple[Path, Path]],
+    queue_size: int = 256,
+    stats: dict = None
+) -> Iterator[dict]:
+    """
+    複数の分割ファイル・エクスポートを並行して読み、新しい順にマージして返す
+    タイムスタンプと内容が同じ投稿は先に指定したエクスポートのものだけを返す
+    保持するのは分割ファイルごとのキュー（queue_size 件まで）のみ
+    """
+    stats = stats if stats is not None else {}
+    stats.update({'shards': len(shards), 'duplicates': 0, 'out_of_order': 0})
+    stop = threading.Event()
+    readers = [ShardReader(json_path, source_base, stop, queue_size)
+               for json_path, source_base in shards]
+    for reader in readers:
+        reader.start()
+
+    current_timestamp = None
+    seen = set()
+    try:
+        merged = heapq.merge(*readers, key=lambda post: post.get('timestamp', 0), reverse=True)
+        for post in merged:
+            # 同じタイムスタンプの投稿は連続して現れるので、その間だけ内容のハッシュを覚えておく
+            timestamp = post.get('timestamp', 0)
+            if timestamp != current_timestamp:
+                current_timestamp = timestamp
+                seen.clear()
+            identity = _post_identity(post)
+            if identity in seen:
+                stats['duplicates'] += 1
+                continue
+            seen.add(identity)
+            yield post
+    finally:
+        stop.set()
+        stats['out_of_order'] = sum(reader.out_of_order for reader in readers)
+
+
+def load_manifest(manifest_path: Path) -> dict:
+    """増分変換用マニフェストを読み込む（存在しなければ空）"""
+    if not manifest_path.exists():
+        return {}
+    with open(manifest_path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    if data.get('version') != MANIFEST_VERSION:
+        return {}
+    return data.get('posts', {})
+
+
+def save_manifest(manifest_path: Path, posts: dict, changes: dict):
+    """マニフェストを一時ファイル経由で書き出す"""
+    data = {
+        'version': MANIFEST_VERSION,
+        'posts': posts,
+        'last_run': changes,
+    }
+    tmp_path = manifest_path.with_name(manifest_path.name + '.tmp')
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=1, sort_keys=True)
+    os.replace(tmp_path, manifest_path)
+
+
+def compute_post_hash(frontmatter: str, content: str, media_files: list[tuple[str, str]]) -> str:
+    """フロントマター・本文・メディア一覧から出力内容のハッシュを計算"""
+    h = hashlib.sha256()
+    h.update(frontmatter.encode('utf-8'))
+    h.update(b'\0')
+    h.update(content.encode('utf-8'))
+    for src_path, dest_filename in media_files:
+        # エクスポートの展開先が変わっても同じ結果になるよう、パスではなくサイズを使う
+        h.update(b'\0')
+        h.update(f"{dest_filename}\0{os.path.getsize(src_path)}".encode('utf-8'))
+    return h.hexdigest()
+
+
+def render_post(
+    post: Post,
+    static_dir: Path,
+    source_base: Path,
+    enrich: bool = False,
+    classify: bool = False
+) -> dict:
+    """
+    投稿 1 件分の出力内容を生成する（ファイルシステムへの書き込みは行わない）
+    enrich を指定すると、タグ・出版社・ISBN・分類結果をフロントマターに加える
+    enrich または classify を指定すると、分類結果を 'verdict' に入れる
+    出力対象外の投稿では None を返す
+    """
+    if post.timestamp is None:
+        return None
+    if post.source_base is not None:
+        source_base = Path(post.source_base)
+
+    date_str, date_iso = convert_timestamp(post.timestamp)
+
+    # 投稿コンテンツを取得
+    content, title, media_files = generate_hugo_content(post, static_dir, source_base)
+
+    # コンテンツがない投稿はスキップ（オプション）
+    if not content.strip() and not media_files:
+        return None
+
+    # ファイル名を生成
+    with stage('slug'):
+        slug = sanitize_filename(title)[:30] if title else str(post.timestamp)
+        slug = re.sub(r'[^\w\-]', '-', slug)
+        slug = re.sub(r'-+', '-', slug).strip('-')
+
+    frontmatter = generate_hugo_frontmatter(date_iso, title)
+    verdict = None
+    if enrich or classify:
+        with stage('classify'):
+            # 分類は classify_books.py が index.md を読む場合と同じく、追加項目なしの記事で行う
+            verdict = classify_post(frontmatter + content)
+    if enrich:
+        with stage('enrich'):
+            tags, params = enrich_frontmatter(content, verdict)
+            frontmatter = generate_hugo_frontmatter(date_iso, title, tags, params)
+
+    rendered = {
+        'timestamp': post.timestamp,
+        'dirname': f"{date_str}-{slug or post.timestamp}",
+        'title': title,
+        'frontmatter': frontmatter,
+        'content': content,
+        'media_files': media_files,
+    }
+    if verdict is not None:
+        rendered['verdict'] = verdict
+    return rendered
+
+
+def render_posts(
+    posts: list[Post],
+    static_dir: Path,
+    source_base: Path,
+    enrich: bool = False,
+    classify: bool = False
+) -> list[dict]:
+    """複数の投稿をまとめて render_post する（ワーカープロセスへの受け渡し単位）"""
+    return [render_post(post, static_dir, source_base, enrich, classify) for post in posts]
+
+
+def encode_article(frontmatter: str, content: str) -> bytes:
+    """index.md の内容をテキストモードで書いた場合と同じバイト列にする"""
+    text = frontmatter + content
+    if os.linesep != '\n':
+        text = text.replace('\n', os.linesep)
+    return text.encode('utf-8')
+
+
+def write_file_atomic(path: Path, data: bytes):
+    """一時ファイルに 1 回で書き込んでから置き換える（途中で中断しても壊れたファイルを残さない）"""
+    tmp_path = path.with_name(f".{path.name}.tmp")
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+class BundleWriter:
+    """
+    Page Bundle の書き出しをまとめて扱う
+    既存のディレクトリは親ディレクトリ（content_dir や year-month 配置の YYYY/MM）ごとに
+    最初に 1 回だけ一覧し、以降は作成済みのものを mkdir しない。
+    skip_unchanged を指定すると、サイズと内容が同じ index.md は書き直さない。
+    """
+
+    def __init__(self, content_dir: Path, skip_unchanged: bool = False):
+        self.content_dir = Path(content_dir)
+        self.skip_unchanged = skip_unchanged
+        self._lock = threading.Lock()
+        # 既存・作成済みのディレクトリと、一覧済みの親ディレクトリ（_key で表す）
+        self._dirs = set()
+        self._scanned = set()
+        self._start = time.perf_counter()
+        self.stats = {
+            'dirs_created': 0,
+            'files_written': 0,
+            'files_unchanged': 0,
+            'bytes_written': 0,
+        }
+
+    def _key(self, path: Path) -> str:
+        """content_dir からの相対パス（振り分け先など content_dir の外なら絶対パス）"""
+        try:
+            return path.relative_to(self.content_dir).as_posix()
+        except ValueError:
+            return str(path)
+
+    def ensure_dir(self, post_dir: Path):
+        """Page Bundle のディレクトリを作成する（作成済みなら何もしない）"""
+        parent = post_dir.parent
+        parent_key = self._key(parent)
+        key = self._key(post_dir)
+        with self._lock:
+            if parent_key not in self._scanned:
+                self._scanned.add(parent_key)
+                if parent.is_dir():
+                    with os.scandir(parent) as it:
+                        self._dirs.update(self._key(parent / entry.name)
+                                          for entry in it if entry.is_dir())
+            if key in self._dirs:
+                return
+        post_dir.mkdir(parents=True, exist_ok=True)
+        with self._lock:
+            self._dirs.add(key)
+            self.stats['dirs_created'] += 1
+
+    def is_unchanged(self, path: Path, data: bytes) -> bool:
+        """既存のファイルが data と同じ内容か（サイズが違えば読まずに判定する）"""
+        try:
+            if os.path.getsize(path) != len(data):
+                return False
+            with open(path, 'rb') as f:
+                return hashlib.sha256(f.read()).digest() == hashlib.sha256(data).digest()
+        except OSError:
+            return False
+
+    def write_file(self, path: Path, data: bytes) -> bool:
+        """ファイルを書き出す。内容が同じで書き出しを省略した場合は False"""
+        if self.skip_unchanged and self.is_unchanged(path, data):
+            with self._lock:
+                self.stats['files_unchanged'] += 1
+            return False
+        write_file_atomic(path, data)
+        with self._lock:
+            self.stats['files_written'] += 1
+            self.stats['bytes_written'] += len(data)
+        return True
+
+    def summary(self) -> str:
+        """実行結果の概要"""
+        st = self.stats
+        elapsed = time.perf_counter() - self._start
+        files = st['files_written'] + st['files_unchanged']
+        rate = files / elapsed if elapsed else 0.0
+        return (f"書き出し {st['files_written']} 件 ({st['bytes_written'] / (1 << 20):.1f} MB), "
+                f"変更なし {st['files_unchanged']} 件, ディレクトリ作成 {st['dirs_created']} 件, "
+                f"{rate:.0f} files/s")
+
+
+def write_post_bundle(
+    post_dir: Path,
+    frontmatter: str,
+    content: str,
+    media_files: list[tuple[str, str]],
+    media_strategy: str = 'copy',
+    media_store: MediaStore = None,
+    writer: BundleWriter = None
+) -> int:
+    """
+    Page Bundle のディレクトリを作成し、メディアと index.md を書き出す
+    media_store を指定すると、メディアはストア内の実体から配置する
+    writer を指定すると、ディレクトリ作成と index.md の書き出しを writer に任せる
+    Returns: メディア配置でコピーを省略できたバイト数
+    """
+    with stage('mkdir'):
+        if writer is not None:
+            writer.ensure_dir(post_dir)
+        else:
+            post_dir.mkdir(parents=True, exist_ok=True)
+    bytes_avoided = 0
+
+    # 画像を配置
+    for src_path, dest_filename in media_files:
+        dest_path = post_dir / dest_filename
+        if os.path.exists(src_path) and not os.path.lexists(dest_path):
+            if media_store is not None:
+                with stage('media_store'):
+                    src_path = media_store.store(src_path)
+            with stage('media_copy') as s:
+                _, avoided = materialize_media(src_path, str(dest_path), media_strategy)
+                s.add_file(dest_path)
+            bytes_avoided += avoided
+
+    # 記事を書き出し
+    article_path = post_dir / 'index.md'
+    with stage('write_index') as s:
+        data = encode_article(frontmatter, content)
+        if writer is not None:
+            writer.write_file(article_path, data)
+        else:
+            write_file_atomic(article_path, data)
+        s.add(len(data))
+
+    return bytes_avoided
+
+
+def iter_rendered_posts(
+    posts: Iterable[Post],
+    static_dir: Path,
+    source_base: Path,
+    executor: Executor = None,
+    batch_size: int = 64,
+    window: int = 8,
+    enrich: bool = False,
+    classify: bool = False
+) -> Iterator[dict]:
+    """
+    投稿を render_post した結果を入力と同じ順序で返す
+    executor を指定するとバッチ単位で並列に処理し、先読みは window バッチまでに抑える
+    """
+    if executor is None:
+        for post in posts:
+            yield render_post(post, static_dir, source_base, enrich, classify)
+        return
+
+    pending = deque()
+    it = iter(posts)
+    while True:
+        batch = list(islice(it, batch_size))
+        if batch:
+            pending.append(executor.submit(render_posts, batch, static_dir, source_base, enrich,
+                                           classify))
+        if pending and (not batch or len(pending) >= window):
+            yield from pending.popleft().result()
+        elif not batch:
+            return
+
+
+class SlugIndex:
+    """
+    出力ディレクトリ名の索引
+    同じ日付・同じ先頭部分の投稿が同じ Page Bundle に上書きされないよう、
+    2 件目以降には投稿時刻の接尾辞（-HHMMSS）を付け、時刻まで同じ場合だけ -2, -3 ... を重ねる。
+    接尾辞は投稿自身の時刻で決まるので、同じ日の投稿を古い順に割り当てれば
+    （iter_oldest_first_by_day）、後から新しい投稿が増えても既存のディレクトリ名は変わらない。
+    出力先（WSL の /mnt/g など）は大文字・小文字を区別しないことがあるため、
+    casefold した名前で重複を判定する
+    """
+
+    def __init__(self):
+        # 割り当て済みのディレクトリ名（casefold したもの）
+        self.used = set()
+        # 接尾辞を付ける前の名前（casefold したもの）→ 次に試す連番
+        self._next_suffix = {}
+        # (元のディレクトリ名, 割り当てたディレクトリ名, タイムスタンプ)
+        self.collisions = []
+
+    def assign(self, dirname: str, timestamp: int = None) -> str:
+        """重複しないディレクトリ名を返す"""
+        key = dirname.casefold()
+        if key not in self.used:
+            self.used.add(key)
+            return dirname
+
+        base = dirname
+        if timestamp is not None:
+            base = f"{dirname}-{datetime.fromtimestamp(timestamp):%H%M%S}"
+        unique = base
+        base_key = base.casefold()
+        if base_key in self.used:
+            n = self._next_suffix.get(base_key, 2)
+            while f"{base_key}-{n}" in self.used:
+                n += 1
+            self._next_suffix[base_key] = n + 1
+            unique = f"{base}-{n}"
+        self.used.add(unique.casefold())
+        self.collisions.append((dirname, unique, timestamp))
+        return unique
+
+    def report(self, limit: int = 20) -> str:
+        """重複したディレクトリ名の一覧"""
+        lines = [f"  ディレクトリ名の重複: {len(self.collisions)} 件（接尾辞を付けて書き出しました）"]
+        for dirname, unique, timestamp in self.collisions[:limit]:
+            lines.append(f"    {dirname} -> {unique} ({timestamp})")
+        if len(self.collisions) > limit:
+            lines.append(f"    ... ほか {len(self.collisions) - limit} 件")
+        return '\n'.join(lines)
+
+
+def iter_oldest_first_by_day(rendered_posts: Iterable[dict]) -> Iterator[dict]:
+    """
+    新しい順に並んだ記事を、同じ日付のまとまりごとに古い順に並べ替えて返す
+    （SlugIndex が同じ日の最も古い投稿に接尾辞なしの名前を割り当てるようにする）
+    保持するのは 1 日分の記事だけで、タイムスタンプが同じ記事は元の順序を保つ
+    """
+    day = None
+    batch = []
+    for rendered in rendered_posts:
+        if rendered is None:
+            continue
+        current = convert_timestamp(rendered['timestamp'])[0]
+        if current != day:
+            batch.sort(key=lambda r: r['timestamp'])
+            yield from batch
+            day = current
+            batch = []
+        batch.append(rendered)
+    batch.sort(key=lambda r: r['timestamp'])
+    yield from batch
+
+
+def partition_of(timestamp: int) -> str:
+    """year-month 配置での記事の置き場所（'YYYY/MM'。日付は convert_timestamp と同じ基準）"""
+    dt = datetime.fromtimestamp(timestamp)
+    return f"{dt:%Y}/{dt:%m}"
+
+
+def write_section_indexes(
+    content_dir: Path,
+    partition: str,
+    written: set[str],
+    writer: 'BundleWriter' = None
+):
+    """
+    年・月のセクションの _index.md を書き出す
+    written（書き出し済みの 'YYYY' / 'YYYY/MM'）にあるものは書き直さない
+    """
+    year, month = partition.split('/')
+    for section, title in ((year, f"{year}年"), (partition, f"{year}年{int(month)}月")):
+        if section in written:
+            continue
+        written.add(section)
+        section_dir = content_dir / section
+        section_dir.mkdir(parents=True, exist_ok=True)
+        data = encode_article(f'---\ntitle: "{title}"\n---\n', '')
+        path = section_dir / '_index.md'
+        if writer is not None:
+            writer.write_file(path, data)
+        elif not path.exists() or path.read_bytes() != data:
+            write_file_atomic(path, data)
+
+
+def write_segments_config(output_dir: Path, content_dir: Path) -> list[str]:
+    """
+    年ごとのセグメント（y2021 など）と、それ以外のページ（トップ・一覧・タクソノミー）の
+    shell セグメントを Hugo の設定に書き出す（hugo --renderSegments で使う）
+    Returns: 年の一覧
+    """
+    years = sorted(d.name for d in content_dir.iterdir()
+                   if d.is_dir() and len(d.name) == 4 and d.name.isdigit())
+    lines = ['# convert.py --layout year-month が生成する（deploy.sh --partitioned で使う）', '']
+    for year in years:
+        lines += [f'[y{year}]',
+                  f'  [[y{year}.includes]]',
+                  f"    path = '{{/posts/{year},/posts/{year}/**}}'",
+                  '']
+    year_glob = '/posts/[0-9][0-9][0-9][0-9]'
+    lines += ['[shell]',
+              '  [[shell.excludes]]',
+              f"    path = '{{{year_glob},{year_glob}/**}}'",
+              '']
+    path = output_dir / SEGMENTS_CONFIG
+    path.parent.mkdir(parents=True, exist_ok=True)
+    write_file_atomic(path, '\n'.join(lines).encode('utf-8'))
+    return years
+
+
 def convert_posts_to_hugo(
     input_json: Path,
     output_dir: Path,
     source_base: Path,
-    max_posts: int = None
+    max_posts: int = None,
+    stream: bool = False,
+    manifest_path: Path = None,
+    jobs: int = 1,
+    media_strategy: str = 'copy',
+    media_store: MediaStore = None,
+    corpus_index: CorpusIndex = None,
+    profiler: Profiler = None,
+    skip_unchanged: bool = False,
+    archive: ArchiveSink = None,
+    enrich: bool = False,
+    shards: list[tuple[Path, Path]] = None,
+    router: Callable[[str, dict], Path] = None,
+    layout: str = 'flat'
+):
+    """
+    Facebook 投稿を Hugo 記事に変換
+    同じディレクトリ名になる投稿は 2 件目以降に -2, -3 ... の接尾辞を付けて別々に書き出す
+    manifest_path を指定すると、前回から出力が変わらない投稿の書き込みを省略し、
+    追加・変更・削除された投稿をマニフェストの last_run に記録する
+    jobs が 2 以上の場合、記事の生成をプロセスプールで、メディアのコピーと
+    index.md の書き出しをスレッドプールで並列に行う（出力は逐次実行と同一）
+    media_strategy でメディアの配置方法（copy / hardlink / reflink / symlink）を選ぶ
+    media_store を指定すると、同じ内容のメディアはストアに 1 つだけ保持する
+    corpus_index を指定すると、書き出した投稿を索引に登録する
+    profiler を指定すると、段階ごとの所要時間・回数・バイト数を記録する
+    skip_unchanged を指定すると、内容が同じ index.md は書き直さない
+    archive を指定すると、Page Bundle をディレクトリではなくアーカイブに順に書き出す
+    （media_strategy / media_store / skip_unchanged は使わない）
+    enrich を指定すると、タグ・出版社・ISBN・分類結果をフロントマターに書き出す
+    shards（discover_export_shards の結果）を指定すると、input_json の代わりに
+    すべての分割ファイル・エクスポートを並行して読み、新しい順にマージして変換する
+    router を指定すると、投稿ごとに router(ディレクトリ名, 生成結果) が返すディレクトリに
+    書き出す（生成結果には分類結果 'verdict' が入る。archive とは併用できない）
+    layout='year-month' では記事を content/posts/YYYY/MM/ 以下に置き、年・月の _index.md と
+    年ごとの Hugo のセグメント設定を書き出す（ディレクトリ名は全体で一意のまま。archive / router とは併用できない）
+    """
+    if layout not in LAYOUTS:
+        raise ValueError(f"不明な配置です: {layout}")
+    if router is not None and archive is not None:
+        raise ValueError("router と archive は同時に指定できません")
+    if layout != 'flat' and (router is not None or archive is not None):
+        raise ValueError(f"{layout} の配置は router / archive と同時に指定できません")
+    if profiler is None:
+        return _convert_posts_to_hugo(input_json, output_dir, source_base, max_posts, stream,
+                                      manifest_path, jobs, media_strategy, media_store,
+                                      corpus_index, skip_unchanged, archive, enrich, shards,
+                                      router, layout)
+
+    profiling.enable(profiler)
+    originals = profiling.instrument(globals(), PROFILED_FUNCTIONS)
+    try:
+        return _convert_posts_to_hugo(input_json, output_dir, source_base, max_posts, stream,
+                                      manifest_path, jobs, media_strategy, media_store,
+                                      corpus_index, skip_unchanged, archive, enrich, shards,
+                                      router, layout)
+    finally:
+        profiling.restore(globals(), originals)
+        profiling.disable()
+
+
+def _convert_posts_to_hugo(
+    input_json: Path,
+    output_dir: Path,
+    source_base: Path,
+    max_posts: int,
+    stream: bool,
+    manifest_path: Path,
+    jobs: int,
+    media_strategy: str,
+    media_store: MediaStore,
+    corpus_index: CorpusIndex,
+    skip_unchanged: bool,
+    archive: ArchiveSink,
+    enrich: bool,
+    shards: list[tuple[Path, Path]],
+    router: Callable[[str, dict], Path],
+    layout: str
 ):
-    """Facebook 投稿を Hugo 記事に変換"""
-    posts = load_facebook_posts(input_json)
+    profiler = profiling.active()
+    merge_stats = {}
+    if shards and len(shards) > 1:
+        posts = iter_merged_posts(shards, stats=merge_stats)
+    else:
+        if shards:
+            input_json, source_base = shards[0]
+        posts = iter_facebook_posts(input_json) if stream else load_facebook_posts(input_json)
+    if max_posts:
+        posts = posts[:max_posts] if isinstance(posts, list) else islice(posts, max_posts)
+    # 生の dict は Post に変換した時点で手放す（一括読み込みでは一覧をその場で置き換える）
+    posts = parse_posts(posts) if isinstance(posts, list) else map(parse_post, posts)
+    if profiler is not None and profiler.post_range:
+        posts = profiler.scope_posts(posts)
 
-    # 出力ディレクトリを作成
+    # 出力ディレクトリを作成（アーカイブに書き出す場合は作らない）
     content_dir = output_dir / 'content' / 'posts'
     static_dir = output_dir / 'static' / 'images'
-    content_dir.mkdir(parents=True, exist_ok=True)
-    static_dir.mkdir(parents=True, exist_ok=True)
+    if archive is None:
+        content_dir.mkdir(parents=True, exist_ok=True)
+        static_dir.mkdir(parents=True, exist_ok=True)
 
     converted_count = 0
 
-    for i, post in enumerate(posts):
-        if max_posts and i >= max_posts:
-            break
+    # 増分変換の状態
+    old_manifest = load_manifest(manifest_path) if manifest_path else {}
+    new_manifest = {}
+    changes = {'added': [], 'changed': [], 'removed': []}
+    unchanged_count = 0
+    bytes_avoided = 0
 
-        if 'timestamp' not in post:
-            continue
+    # 並列実行の準備（計測中は別プロセスの処理を記録できないのでスレッドで生成する）
+    if jobs <= 1:
+        render_executor = None
+    elif profiler is not None:
+        render_executor = ThreadPoolExecutor(max_workers=jobs)
+    else:
+        render_executor = ProcessPoolExecutor(max_workers=jobs)
+    # アーカイブへの書き出しは投稿順に主スレッドで行う
+    write_executor = ThreadPoolExecutor(max_workers=jobs) if jobs > 1 and archive is None else None
+    write_queue = deque()
+    slug_index = SlugIndex()
+    # _index.md を書き出した年・月
+    sections = set()
+    writer = BundleWriter(content_dir, skip_unchanged=skip_unchanged) if archive is None else None
 
-        date_str, date_iso = convert_timestamp(post['timestamp'])
+    try:
+        rendered_posts = iter_rendered_posts(posts, static_dir, source_base, render_executor,
+                                             enrich=enrich, classify=router is not None)
+        for rendered in iter_oldest_first_by_day(rendered_posts):
+            # 記事用のディレクトリ（Page Bundle形式）
+            dirname = slug_index.assign(rendered['dirname'], rendered['timestamp'])
+            if layout == 'year-month':
+                partition = partition_of(rendered['timestamp'])
+                if partition not in sections:
+                    write_section_indexes(content_dir, partition, sections, writer)
+                post_dir = content_dir / partition / dirname
+            else:
+                post_dir = (content_dir if router is None else router(dirname, rendered)) / dirname
+            frontmatter = rendered['frontmatter']
+            content = rendered['content']
+            media_files = rendered['media_files']
+            article_path = post_dir / 'index.md'
 
-        # 投稿コンテンツを取得
-        content, title, media_files = generate_hugo_content(post, static_dir, source_base)
+            converted_count += 1
+            if converted_count % 100 == 0:
+                print(f"  {converted_count} 件変換完了...")
 
-        # コンテンツがない投稿はスキップ（オプション）
-        if not content.strip() and not media_files:
-            continue
+            if corpus_index is not None:
+                with stage('corpus_index'):
+                    document = frontmatter + content
+                    corpus_index.upsert_post(
+                        post_dir.name, rendered['timestamp'], rendered['title'], document,
+                        post_dir.parent, extract_urls(document), find_publisher_domain(document)
+                    )
 
-        # ファイル名を生成
-        slug = sanitize_filename(title)[:30] if title else str(post['timestamp'])
-        slug = re.sub(r'[^\w\-]', '-', slug)
-        slug = re.sub(r'-+', '-', slug).strip('-')
-        filename = f"{date_str}-{slug or post['timestamp']}.md"
+            if manifest_path:
+                # 同じタイムスタンプの投稿が複数ある場合は連番で区別する
+                key = str(rendered['timestamp'])
+                n = 2
+                while key in new_manifest:
+                    key = f"{rendered['timestamp']}#{n}"
+                    n += 1
+                with stage('manifest_hash'):
+                    entry = {
+                        'path': post_dir.name if layout == 'flat' else f"{partition}/{post_dir.name}",
+                        'hash': compute_post_hash(frontmatter, content, media_files),
+                    }
+                new_manifest[key] = entry
+                previous = old_manifest.get(key)
 
-        # 記事用のディレクトリを作成（Page Bundle形式）
-        post_dir = content_dir / f"{date_str}-{slug or post['timestamp']}"
-        post_dir.mkdir(parents=True, exist_ok=True)
+                if previous is None:
+                    changes['added'].append(entry['path'])
+                elif previous != entry:
+                    changes['changed'].append(entry['path'])
+                    if previous['path'] != entry['path']:
+                        # タイトル変更で出力先が変わった場合、旧ディレクトリは削除扱い
+                        changes['removed'].append(previous['path'])
+                elif archive is None and article_path.exists():
+                    # 出力がバイト単位で同一なので書き込まない
+                    unchanged_count += 1
+                    continue
 
-        # 画像をコピー
-        for src_path, dest_filename in media_files:
-            dest_path = post_dir / dest_filename
-            if os.path.exists(src_path) and not dest_path.exists():
-                shutil.copy2(src_path, dest_path)
+            if archive is not None:
+                with stage('archive'):
+                    archive.add_bundle(post_dir.name, encode_article(frontmatter, content),
+                                       media_files, rendered['timestamp'])
+                continue
 
-        # 記事を書き出し
-        frontmatter = generate_hugo_frontmatter(date_iso, title)
-        article_path = post_dir / 'index.md'
-        with open(article_path, 'w', encoding='utf-8') as f:
-            f.write(frontmatter)
-            f.write(content)
+            if write_executor is None:
+                bytes_avoided += write_post_bundle(post_dir, frontmatter, content, media_files,
+                                                   media_strategy, media_store, writer)
+                continue
 
-        converted_count += 1
-        if converted_count % 100 == 0:
-            print(f"  {converted_count} 件変換完了...")
+            write_queue.append(write_executor.submit(write_post_bundle, post_dir, frontmatter,
+                                                     content, media_files, media_strategy,
+                                                     media_store, writer))
+
+            # 書き込み待ちが溜まりすぎないように古いものから完了を待つ
+            while len(write_queue) > jobs * 16:
+                bytes_avoided += write_queue.popleft().result()
+
+        for future in write_queue:
+            bytes_avoided += future.result()
+    finally:
+        if render_executor is not None:
+            render_executor.shutdown(cancel_futures=True)
+        if write_executor is not None:
+            write_executor.shutdown()
+
+    if merge_stats:
+        print(f"  分割ファイル {merge_stats['shards']} 件をマージ: 重複除外 {merge_stats['duplicates']} 件")
+        if merge_stats['out_of_order']:
+            print(f"  注意: 新しい順に並んでいない投稿が {merge_stats['out_of_order']} 件あります"
+                  "（マージ後の順序が崩れている可能性があります）")
+    if archive is not None:
+        print(f"  アーカイブ: {archive.summary()}")
+    else:
+        print(f"  index.md: {writer.summary()}")
+    if slug_index.collisions:
+        print(slug_index.report())
+    if layout == 'year-month':
+        years = write_segments_config(output_dir, content_dir)
+        print(f"  年ごとのセグメント: {len(years)} 件 ({output_dir / SEGMENTS_CONFIG})")
+        flat = sum(1 for d in content_dir.iterdir() if d.is_dir() and not d.name.isdigit())
+        if flat:
+            print(f"  注意: {content_dir} 直下に以前の配置の記事が {flat} 件残っています"
+                  "（同じ記事が重複して公開されるため、移動または削除してください）")
+
+    if manifest_path:
+        if max_posts:
+            # 一部の投稿だけを変換した場合は未処理分を削除扱いにしない
+            for key, entry in old_manifest.items():
+                new_manifest.setdefault(key, entry)
+        else:
+            changes['removed'].extend(
+                entry['path'] for key, entry in old_manifest.items()
+                if key not in new_manifest
+            )
+        # 今回書き出した投稿が使っているディレクトリは削除扱いにしない
+        # （タイトル変更で空いた名前に別の投稿が入った場合など）
+        live = {entry['path'] for entry in new_manifest.values()}
+        changes['removed'] = sorted(set(changes['removed']) - live)
+        save_manifest(manifest_path, new_manifest, changes)
+        print(f"  追加: {len(changes['added'])} 件 / 変更: {len(changes['changed'])} 件 / "
+              f"削除: {len(changes['removed'])} 件 / 変更なし: {unchanged_count} 件")
+
+    if media_strategy != 'copy':
+        print(f"  メディア配置 ({media_strategy}): {bytes_avoided / (1 << 20):.1f} MB のコピーを省略")
+    if corpus_index is not None:
+        corpus_index.commit()
+    if media_store is not None:
+        media_store.save()
+        print(f"  メディアストア: {media_store.summary()}")
 
     return converted_count
 
 
+def parse_args(argv: list[str] = None) -> argparse.Namespace:
+    """コマンドライン引数を解析"""
+    parser = argparse.ArgumentParser(description='Facebook データを Hugo ブログ記事に変換します')
+    parser.add_argument('--export', type=Path, action='append', default=None, metavar='PATH',
+                        help='読み込むエクスポート（展開したディレクトリ・your_facebook_activity・'
+                             '投稿 JSON）。複数指定でき、先に指定したものを優先して重複を除く'
+                             '（既定: your_facebook_activity の分割ファイルすべて）')
+    parser.add_argument('--stream', action='store_true',
+                        help='JSON を投稿 1 件ずつ読み込む（巨大なエクスポート向け）')
+    parser.add_argument('--incremental', action='store_true',
+                        help=f'{MANIFEST_FILENAME} を使い、前回から変わった投稿だけを書き出す')
+    parser.add_argument('--jobs', type=int, default=1, metavar='N',
+                        help='記事生成とメディアコピーを N 並列で行う')
+    parser.add_argument('--media-strategy', choices=MEDIA_STRATEGIES, default=None,
+                        help='メディアの配置方法（使えない場合はコピーに切り替える。'
+                             '既定は copy、--media-store 指定時は hardlink）')
+    parser.add_argument('--index', type=Path, default=None, metavar='PATH',
+                        help='書き出した投稿を登録するコーパス索引（SQLite）')
+    parser.add_argument('--media-store', type=Path, default=None, metavar='DIR',
+                        help='メディアを内容ハッシュごとに 1 つだけ保持するストアのディレクトリ')
+    parser.add_argument('--archive', type=Path, default=None, metavar='PATH',
+                        help='Page Bundle をアーカイブ（.tar / .tar.gz / .tgz / .zip）に書き出す'
+                             '（bundle_archive.py extract で展開できる）')
+    parser.add_argument('--enrich', action='store_true',
+                        help='タグ（ハッシュタグ）・出版社・ISBN・分類結果をフロントマターに書き出す'
+                             '（Hugo のタクソノミーで一覧ページを作れる）')
+    parser.add_argument('--layout', choices=LAYOUTS, default='flat',
+                        help='記事の配置（year-month: content/posts/YYYY/MM/ 以下に置き、'
+                             'deploy.sh --partitioned で年ごとに並列ビルドできるようにする）')
+    parser.add_argument('--skip-unchanged', action='store_true',
+                        help='内容が同じ index.md は書き直さない（サイズと内容を比較する）')
+    parser.add_argument('--profile', action='store_true',
+                        help='段階ごとの所要時間・回数・バイト数を集計して表示する')
+    parser.add_argument('--trace', type=Path, default=None, metavar='PATH',
+                        help='段階ごとのトレースを Chrome のトレースイベント JSON で書き出す')
+    parser.add_argument('--cprofile', type=Path, default=None, metavar='PATH',
+                        help='--profile-range の投稿を処理する間の cProfile の結果を書き出す')
+    parser.add_argument('--profile-range', type=profiling.parse_range, default=None,
+                        metavar='START:END',
+                        help='cProfile の対象とする投稿の範囲（0 始まり、END は含まない。'
+                             '--cprofile と一緒に指定する）')
+    args = parser.parse_args(argv)
+    # アーカイブを開く前に、変換の途中で失敗する組み合わせを拒否する
+    if args.archive and args.layout != 'flat':
+        parser.error(f"--layout {args.layout} と --archive は同時に指定できません")
+    if args.profile_range is not None and not args.cprofile:
+        parser.error("--profile-range は --cprofile と一緒に指定してください")
+    if args.cprofile and args.profile_range is None:
+        args.profile_range = (0, 1 << 62)
+    return args
+
+
 def main():
     """メイン処理"""
+    args = parse_args()
+
     # パスの設定
     base_dir = Path(__file__).parent
     source_base = base_dir / 'your_facebook_activity'
-    input_json = source_base / 'posts' / 'your_posts__check_ins__photos_and_videos_1.json'
     output_dir = base_dir / 'hugo-blog'
+    shards = discover_export_shards(args.export or [source_base])
 
     print("Facebook データを Hugo ブログ記事に変換します...")
-    print(f"入力: {input_json}")
+    for json_path, _ in shards:
+        print(f"入力: {json_path}")
     print(f"出力: {output_dir}")
 
-    if not input_json.exists():
-        print(f"エラー: 入力ファイルが見つかりません: {input_json}")
+    if not shards:
+        print(f"エラー: 入力ファイルが見つかりません: {', '.join(map(str, args.export or [source_base]))}")
         return 1
+    input_json, source_base = shards[0]
 
     # 変換を実行
-    count = convert_posts_to_hugo(input_json, output_dir, source_base)
+    manifest_path = output_dir / MANIFEST_FILENAME if args.incremental else None
+    media_store = MediaStore(args.media_store) if args.media_store else None
+    corpus_index = CorpusIndex(args.index) if args.index else None
+    archive = ArchiveSink(args.archive) if args.archive else None
+    media_strategy = args.media_strategy or ('hardlink' if media_store else 'copy')
+    profiler = None
+    if args.profile or args.trace or args.cprofile:
+        profiler = Profiler(trace=args.trace is not None,
+                            post_range=args.profile_range if args.cprofile else None)
+        if args.cprofile and args.jobs > 1:
+            print("注意: cProfile は主スレッドの処理だけを記録します（--jobs 1 を推奨）")
+    try:
+        count = convert_posts_to_hugo(input_json, output_dir, source_base, stream=args.stream,
+                                      manifest_path=manifest_path, jobs=args.jobs,
+                                      media_strategy=media_strategy, media_store=media_store,
+                                      corpus_index=corpus_index, profiler=profiler,
+                                      skip_unchanged=args.skip_unchanged, archive=archive,
+                                      enrich=args.enrich, shards=shards, layout=args.layout)
+    except BaseException:
+        # 書き込み途中のアーカイブ（*.tmp）を残さない（Ctrl+C で中断した場合も含む）
+        if archive is not None:
+            archive.abort()
+        raise
+    finally:
+        if corpus_index is not None:
+            corpus_index.close()
+    if archive is not None:
+        archive.close()
+
+    if profiler is not None:
+        print("\n" + profiler.summary())
+        if args.trace:
+            profiler.write_trace(args.trace)
+            print(f"トレース: {args.trace}")
+        if args.cprofile:
+            profiler.dump_cprofile(args.cprofile)
+            print(f"cProfile: {args.cprofile}")
 
     print(f"\n完了! {count} 件の投稿を変換しました。")
     print(f"出力先: {output_dir}")
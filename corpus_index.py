@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+"""
+投稿コーパスの索引（SQLite）
+
+convert.py が記事を書き出すときに登録し、classify_books.py と review_posts.py は
+ディレクトリを走査して index.md を読み直す代わりにこの索引を参照する。
+
+使い方:
+  python corpus_index.py INDEX.sqlite stats
+  python corpus_index.py INDEX.sqlite search 検索語
+  python corpus_index.py INDEX.sqlite publishers
+  python corpus_index.py INDEX.sqlite relocate 旧ディレクトリ 新ディレクトリ
+"""
+
+import argparse
+import re
+import sqlite3
+from pathlib import Path
+from urllib.parse import urlsplit
+
+URL_PATTERN = re.compile(r'https?://[^\s<>()\[\]"]+')
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS posts (
+    slug TEXT PRIMARY KEY,
+    timestamp INTEGER,
+    title TEXT,
+    body TEXT,
+    location TEXT,
+    publisher TEXT,
+    verdict TEXT,
+    review_state TEXT NOT NULL DEFAULT 'pending'
+);
+CREATE INDEX IF NOT EXISTS posts_location ON posts(location, review_state);
+CREATE INDEX IF NOT EXISTS posts_publisher ON posts(publisher);
+CREATE TABLE IF NOT EXISTS links (
+    slug TEXT NOT NULL,
+    url TEXT NOT NULL,
+    host TEXT
+);
+CREATE INDEX IF NOT EXISTS links_slug ON links(slug);
+CREATE INDEX IF NOT EXISTS links_host ON links(host);
+'''
+
+# posts の title / body を全文検索できるようにする（FTS5 がない SQLite では作らない）
+# 日本語は単語区切りがないため trigram トークナイザ（SQLite 3.34 以降）で部分一致させる
+FTS_SCHEMA = '''
+CREATE VIRTUAL TABLE IF NOT EXISTS posts_fts USING fts5(
+    title, body, content='posts', content_rowid='rowid', tokenize='trigram'
+);
+CREATE TRIGGER IF NOT EXISTS posts_ai AFTER INSERT ON posts BEGIN
+    INSERT INTO posts_fts(rowid, title, body) VALUES (new.rowid, new.title, new.body);
+END;
+CREATE TRIGGER IF NOT EXISTS posts_ad AFTER DELETE ON posts BEGIN
+    INSERT INTO posts_fts(posts_fts, rowid, title, body) VALUES ('delete', old.rowid, old.title, old.body);
+END;
+CREATE TRIGGER IF NOT EXISTS posts_au AFTER UPDATE OF title, body ON posts BEGIN
+    INSERT INTO posts_fts(posts_fts, rowid, title, body) VALUES ('delete', old.rowid, old.title, old.body);
+    INSERT INTO posts_fts(rowid, title, body) VALUES (new.rowid, new.title, new.body);
+END;
+'''
+
+
+def extract_urls(text: str) -> list[str]:
+    """本文中の URL を出現順に重複なく取り出す"""
+    return list(dict.fromkeys(URL_PATTERN.findall(text)))
+
+
+class CorpusIndex:
+    """投稿の本文・リンク・分類結果・振り分け状態を保持する索引"""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._locations = {}
+        self.conn = sqlite3.connect(str(self.path))
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.executescript(SCHEMA)
+        try:
+            self.conn.executescript(FTS_SCHEMA)
+            self.has_fts = True
+        except sqlite3.OperationalError:
+            self.has_fts = False
+        self.conn.commit()
+
+    def close(self):
+        self.conn.commit()
+        self.conn.close()
+
+    def _location(self, location: Path) -> str:
+        """場所を絶対パスの文字列にそろえる"""
+        key = str(location)
+        resolved = self._locations.get(key)
+        if resolved is None:
+            resolved = str(Path(location).resolve())
+            self._locations[key] = resolved
+        return resolved
+
+    def commit(self):
+        self.conn.commit()
+
+    def upsert_post(
+        self,
+        slug: str,
+        timestamp: int,
+        title: str,
+        body: str,
+        location: Path,
+        urls: list[str],
+        publisher: str = None
+    ):
+        """
+        投稿を登録する（既存の投稿は本文などを更新する）
+        振り分け済みの投稿の場所と状態は保持し、本文が変わった場合だけ分類結果を消す
+        """
+        self.conn.execute('''
+            INSERT INTO posts (slug, timestamp, title, body, location, publisher)
+            VALUES (?, ?, ?, ?, ?, ?)
+            ON CONFLICT(slug) DO UPDATE SET
+                timestamp = excluded.timestamp,
+                title = excluded.title,
+                verdict = CASE WHEN posts.body = excluded.body THEN posts.verdict END,
+                body = excluded.body,
+                publisher = excluded.publisher
+        ''', (slug, timestamp, title, body, self._location(location), publisher))
+        self.conn.execute('DELETE FROM links WHERE slug = ?', (slug,))
+        self.conn.executemany(
+            'INSERT INTO links (slug, url, host) VALUES (?, ?, ?)',
+            [(slug, url, urlsplit(url).hostname) for url in urls]
+        )
+
+    def set_verdict(self, slug: str, verdict: str):
+        self.conn.execute('UPDATE posts SET verdict = ? WHERE slug = ?', (verdict, slug))
+
+    def set_location(self, slug: str, location: Path, review_state: str = None):
+        """投稿の移動先（と振り分け状態）を記録する"""
+        if review_state is None:
+            self.conn.execute('UPDATE posts SET location = ? WHERE slug = ?',
+                              (self._location(location), slug))
+        else:
+            self.conn.execute('UPDATE posts SET location = ?, review_state = ? WHERE slug = ?',
+                              (self._location(location), review_state, slug))
+
+    def set_review_state(self, slug: str, review_state: str):
+        self.conn.execute('UPDATE posts SET review_state = ? WHERE slug = ?', (review_state, slug))
+
+    def posts_in(self, location: Path) -> list[tuple[str, str]]:
+        """location にある投稿の (slug, 本文) を slug 順に返す"""
+        return self.conn.execute(
+            'SELECT slug, body FROM posts WHERE location = ? ORDER BY slug',
+            (self._location(location),)
+        ).fetchall()
+
+    def pending_posts(self, location: Path) -> list[str]:
+        """location にある未振り分けの投稿の slug を slug 順に返す"""
+        rows = self.conn.execute(
+            "SELECT slug FROM posts WHERE location = ? AND review_state IN ('pending', 'skipped') "
+            "ORDER BY slug",
+            (self._location(location),)
+        )
+        return [slug for slug, in rows]
+
+    def publisher_posts(self, location: Path) -> dict[str, str]:
+        """location にある投稿のうち出版社 URL を含むものの slug → ドメイン"""
+        rows = self.conn.execute(
+            'SELECT slug, publisher FROM posts WHERE location = ? AND publisher IS NOT NULL',
+            (self._location(location),)
+        )
+        return dict(rows)
+
+    def relocate(self, old_location: Path, new_location: Path) -> int:
+        """ディレクトリごと移動した投稿の場所を書き換え、件数を返す"""
+        cursor = self.conn.execute('UPDATE posts SET location = ? WHERE location = ?',
+                                   (self._location(new_location), self._location(old_location)))
+        self.conn.commit()
+        return cursor.rowcount
+
+    def get_body(self, slug: str) -> str:
+        row = self.conn.execute('SELECT body FROM posts WHERE slug = ?', (slug,)).fetchone()
+        return row[0] if row else ""
+
+    def search(self, query: str, limit: int = 50) -> list[tuple[str, str]]:
+        """本文とタイトルを全文検索し、(slug, タイトル) を返す"""
+        # trigram は 3 文字未満の語を検索できない
+        if self.has_fts and len(query) >= 3:
+            sql = ('SELECT posts.slug, posts.title FROM posts_fts '
+                   'JOIN posts ON posts.rowid = posts_fts.rowid '
+                   'WHERE posts_fts MATCH ? ORDER BY rank LIMIT ?')
+            phrase = '"' + query.replace('"', '""') + '"'
+            return self.conn.execute(sql, (phrase, limit)).fetchall()
+        like = f"%{query}%"
+        return self.conn.execute(
+            'SELECT slug, title FROM posts WHERE title LIKE ? OR body LIKE ? LIMIT ?',
+            (like, like, limit)
+        ).fetchall()
+
+    def stats(self) -> dict:
+        """場所・分類結果・振り分け状態ごとの件数"""
+        result = {}
+        for column in ('location', 'verdict', 'review_state'):
+            rows = self.conn.execute(f'SELECT {column}, COUNT(*) FROM posts GROUP BY {column}')
+            result[column] = {str(key): count for key, count in rows}
+        result['links'] = self.conn.execute('SELECT COUNT(*) FROM links').fetchone()[0]
+        return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='投稿コーパスの索引を参照します')
+    parser.add_argument('index', type=Path, help='索引ファイル（SQLite）')
+    parser.add_argument('command', choices=('stats', 'search', 'publishers', 'relocate'))
+    parser.add_argument('args', nargs='*', help='search の検索語、relocate の移動元と移動先')
+    args = parser.parse_args()
+
+    index = CorpusIndex(args.index)
+    try:
+        if args.command == 'stats':
+            for name, counts in index.stats().items():
+                print(f"{name}: {counts}")
+        elif args.command == 'search':
+            for slug, title in index.search(' '.join(args.args)):
+                print(f"{slug}\t{title}")
+        elif args.command == 'relocate':
+            if len(args.args) != 2:
+                parser.error('relocate には移動元と移動先を指定してください')
+            count = index.relocate(Path(args.args[0]), Path(args.args[1]))
+            print(f"{count} 件の場所を更新しました")
+        else:
+            rows = index.conn.execute(
+                'SELECT publisher, COUNT(*) FROM posts WHERE publisher IS NOT NULL '
+                'GROUP BY publisher ORDER BY COUNT(*) DESC'
+            )
+            for publisher, count in rows:
+                print(f"{count:6d}  {publisher}")
+    finally:
+        index.close()
+    return 0
+
+
+if __name__ == '__main__':
+    exit(main())
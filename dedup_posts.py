@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+"""
+ほぼ同じ内容の投稿（同じ書籍リンクの再投稿・シェアなど）を MinHash / LSH でまとめる
+
+本文の文字 n-gram の MinHash 署名を LSH のバケットに振り分け、同じバケットに入った
+組だけを比較するので、投稿数の 2 乗の比較は行わない。署名は本文のハッシュごとに
+キャッシュし、次回以降は変わった投稿だけを計算する。
+
+使い方:
+  python dedup_posts.py [投稿ディレクトリ] [--index PATH | --archive PATH] [--output clusters.json]
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import random
+import re
+import zlib
+from pathlib import Path
+
+from bundle_archive import BundleArchive
+from corpus_index import CorpusIndex
+
+# 文字 n-gram の長さ
+SHINGLE_SIZE = 5
+# 署名の長さ（= BANDS * ROWS）
+NUM_PERM = 64
+BANDS = 16
+# 同じクラスタとみなす推定 Jaccard 係数の下限
+THRESHOLD = 0.8
+
+# 置換に使う素数（2^61 - 1）
+_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+
+FRONTMATTER_PATTERN = re.compile(r'\A---\n.*?\n---\n', re.DOTALL)
+
+
+def normalize_body(text: str) -> str:
+    """フロントマターを除き、空白をそろえて小文字にする"""
+    text = FRONTMATTER_PATTERN.sub('', text)
+    return ' '.join(text.split()).lower()
+
+
+def shingle_hashes(text: str, k: int = SHINGLE_SIZE) -> set[int]:
+    """文字 k-gram ごとの 32 ビットハッシュ（実行ごとに変わらない crc32 を使う）"""
+    if not text:
+        return set()
+    if len(text) <= k:
+        return {zlib.crc32(text.encode('utf-8'))}
+    return {zlib.crc32(text[i:i + k].encode('utf-8')) for i in range(len(text) - k + 1)}
+
+
+class MinHasher:
+    """(a * x + b) mod p の置換を num_perm 個使う MinHash"""
+
+    def __init__(self, num_perm: int = NUM_PERM, seed: int = 1):
+        rng = random.Random(seed)
+        self.num_perm = num_perm
+        self.seed = seed
+        self.params = [(rng.randrange(1, _PRIME), rng.randrange(0, _PRIME)) for _ in range(num_perm)]
+
+    def signature(self, hashes: set[int]) -> list[int]:
+        return [min((a * x + b) % _PRIME for x in hashes) & _MAX_HASH for a, b in self.params]
+
+
+class SignatureCache:
+    """本文のハッシュ → MinHash 署名（パラメータが変わったら作り直す）"""
+
+    VERSION = 1
+
+    def __init__(self, path: Path, hasher: MinHasher, shingle_size: int = SHINGLE_SIZE):
+        self.path = Path(path)
+        self.key = {'num_perm': hasher.num_perm, 'seed': hasher.seed, 'shingle_size': shingle_size}
+        self.signatures = {}
+        self.hits = 0
+        if self.path.exists():
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('version') == self.VERSION and data.get('params') == self.key:
+                self.signatures = data.get('signatures', {})
+
+    def get(self, content_hash: str) -> list[int]:
+        signature = self.signatures.get(content_hash)
+        if signature is not None:
+            self.hits += 1
+        return signature
+
+    def put(self, content_hash: str, signature: list[int]):
+        self.signatures[content_hash] = signature
+
+    def save(self):
+        """キャッシュを一時ファイル経由で書き出す"""
+        data = {'version': self.VERSION, 'params': self.key, 'signatures': self.signatures}
+        tmp_path = self.path.with_name(self.path.name + '.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f)
+        os.replace(tmp_path, self.path)
+
+
+def _find(parent: dict, x: str) -> str:
+    while parent[x] != x:
+        parent[x] = parent[parent[x]]
+        x = parent[x]
+    return x
+
+
+def find_clusters(
+    posts: list[tuple[str, str]],
+    threshold: float = THRESHOLD,
+    bands: int = BANDS,
+    hasher: MinHasher = None,
+    cache: SignatureCache = None
+) -> list[list[str]]:
+    """
+    (投稿名, 本文) の一覧から、ほぼ同じ内容の投稿のクラスタ（2 件以上）を返す
+    クラスタ内とクラスタの並びは投稿名順
+    """
+    hasher = hasher or MinHasher()
+    rows = hasher.num_perm // bands
+
+    signatures = {}
+    for name, body in posts:
+        text = normalize_body(body)
+        if not text:
+            # 本文のない投稿（画像のみなど）はまとめない
+            continue
+        content_hash = hashlib.sha256(text.encode('utf-8')).hexdigest()
+        signature = cache.get(content_hash) if cache is not None else None
+        if signature is None:
+            signature = hasher.signature(shingle_hashes(text))
+            if cache is not None:
+                cache.put(content_hash, signature)
+        signatures[name] = (content_hash, signature)
+
+    # LSH: 署名を帯に分け、いずれかの帯が一致した組だけを候補にする
+    buckets = {}
+    for name, (_, signature) in signatures.items():
+        for band in range(bands):
+            key = (band, tuple(signature[band * rows:(band + 1) * rows]))
+            buckets.setdefault(key, []).append(name)
+
+    # 候補の組の推定類似度を確かめ、union-find でまとめる（同じクラスタ同士は比較しない）
+    parent = {name: name for name in signatures}
+    for members in buckets.values():
+        for i, name_a in enumerate(members):
+            sig_a = signatures[name_a][1]
+            for name_b in members[i + 1:]:
+                root_a, root_b = _find(parent, name_a), _find(parent, name_b)
+                if root_a == root_b:
+                    continue
+                sig_b = signatures[name_b][1]
+                similarity = sum(a == b for a, b in zip(sig_a, sig_b)) / hasher.num_perm
+                if similarity >= threshold:
+                    parent[root_b] = root_a
+
+    groups = {}
+    for name in signatures:
+        groups.setdefault(_find(parent, name), []).append(name)
+    return sorted((sorted(group) for group in groups.values() if len(group) > 1),
+                  key=lambda group: group[0])
+
+
+def cluster_lookup(clusters: list[list[str]]) -> dict[str, list[str]]:
+    """投稿名 → その投稿が属するクラスタ"""
+    return {name: cluster for cluster in clusters for name in cluster}
+
+
+def load_posts(
+    source_dir: Path,
+    index: CorpusIndex = None,
+    archive: BundleArchive = None
+) -> list[tuple[str, str]]:
+    """投稿ディレクトリ・コーパス索引・アーカイブのいずれかから (投稿名, 本文) を読む"""
+    if archive is not None:
+        return list(archive.iter_bundles())
+    if index is not None:
+        return index.posts_in(source_dir)
+    posts = []
+    for post_dir in sorted(d for d in source_dir.iterdir() if d.is_dir()):
+        index_path = post_dir / 'index.md'
+        if index_path.exists():
+            with open(index_path, 'r', encoding='utf-8') as f:
+                posts.append((post_dir.name, f.read()))
+    return posts
+
+
+def parse_args(argv: list[str] = None) -> argparse.Namespace:
+    """コマンドライン引数を解析"""
+    parser = argparse.ArgumentParser(description='ほぼ同じ内容の投稿をまとめます')
+    parser.add_argument('source', type=Path, nargs='?',
+                        default=Path(__file__).parent / 'hugo-blog-content-candidate',
+                        help='投稿ディレクトリ（既定: hugo-blog-content-candidate）')
+    parser.add_argument('--index', type=Path, default=None, metavar='PATH',
+                        help='ディレクトリを走査せず、コーパス索引の本文を使う')
+    parser.add_argument('--archive', type=Path, default=None, metavar='PATH',
+                        help='convert.py --archive のアーカイブ内の投稿を使う')
+    parser.add_argument('--threshold', type=float, default=THRESHOLD,
+                        help=f'同じクラスタとみなす類似度（既定: {THRESHOLD}）')
+    parser.add_argument('--cache', type=Path, default=Path(__file__).parent / '.dedup-cache.json',
+                        metavar='PATH', help='MinHash 署名のキャッシュ')
+    parser.add_argument('--no-cache', action='store_true', help='署名のキャッシュを使わない')
+    parser.add_argument('--output', default=None, metavar='PATH',
+                        help='クラスタを JSON で書き出す（- なら標準出力）')
+    return parser.parse_args(argv)
+
+
+def main():
+    args = parse_args()
+
+    index = CorpusIndex(args.index) if args.index else None
+    archive = BundleArchive(args.archive) if args.archive else None
+    posts = load_posts(args.source, index, archive)
+    if index is not None:
+        index.close()
+    if archive is not None:
+        archive.close()
+
+    hasher = MinHasher()
+    cache = None if args.no_cache else SignatureCache(args.cache, hasher)
+    clusters = find_clusters(posts, args.threshold, hasher=hasher, cache=cache)
+    if cache is not None:
+        cache.save()
+
+    if args.output == '-':
+        print(json.dumps(clusters, ensure_ascii=False, indent=1))
+        return 0
+
+    duplicates = sum(len(cluster) - 1 for cluster in clusters)
+    print(f"投稿 {len(posts)} 件中、{len(clusters)} クラスタ（重複 {duplicates} 件）")
+    if cache is not None:
+        print(f"  署名キャッシュ再利用: {cache.hits} 件")
+    for cluster in clusters[:20]:
+        print(f"  [{len(cluster)}] " + ', '.join(cluster[:5]) + (' ...' if len(cluster) > 5 else ''))
+    if len(clusters) > 20:
+        print(f"  ... ほか {len(clusters) - 20} クラスタ")
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(clusters, f, ensure_ascii=False, indent=1)
+    return 0
+
+
+if __name__ == '__main__':
+    exit(main())
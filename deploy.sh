@@ -1,12 +1,21 @@
 #!/bin/bash
 # Hugo サイトのローカルビルドスクリプト
 # .github/workflows/deploy.yml の Build ステージと同等の処理を実行
+#
+# 使い方:
+#   ./deploy.sh                 # サイト全体を 1 回の hugo でビルド
+#   ./deploy.sh --partitioned   # 年ごとのセグメントを並列にビルドして public/ にまとめる
+#                               # （convert.py --layout year-month で変換しておくこと）
 
 set -e
 
 HUGO_VERSION="0.147.0"
 SCRIPT_DIR="$(cd "$(dirname "${BASH_SOURCE[0]}")" && pwd)"
 HUGO_BLOG_DIR="${SCRIPT_DIR}/hugo-blog"
+# 分割ビルドの各セグメントの出力と内容ハッシュを置くディレクトリ
+PARTITION_DIR="${HUGO_BLOG_DIR}/.partitions"
+# 分割ビルドで同時に実行する hugo の数
+BUILD_JOBS="${BUILD_JOBS:-$(nproc 2>/dev/null || echo 4)}"
 
 # 色付き出力
 GREEN='\033[0;32m'
@@ -98,8 +107,130 @@ build_hugo() {
     info "Output directory: ${HUGO_BLOG_DIR}/public"
 }
 
+# 分割ビルド: セグメントの内容ハッシュ（ファイルのパスと内容）
+tree_hash() {
+    find "$@" -type f -print0 2>/dev/null | LC_ALL=C sort -z | xargs -0 -r sha256sum | sha256sum | cut -d' ' -f1
+}
+
+# 分割ビルド: 1 つのセグメントを出力ディレクトリにビルドし、成功したら内容ハッシュを記録
+render_segment() {
+    local segment="$1"
+    local hash="$2"
+    local dest="${PARTITION_DIR}/${segment}/public"
+    local args=(--minify --renderSegments "${segment}" --destination "${dest}" --cleanDestinationDir)
+    if [[ -n "${BASE_URL}" ]]; then
+        args+=(--baseURL "${BASE_URL}")
+    fi
+    if hugo "${args[@]}" > "${PARTITION_DIR}/${segment}/build.log" 2>&1; then
+        echo "${hash}" > "${PARTITION_DIR}/${segment}/hash"
+    fi
+}
+
+# 年ごとに分割してビルド（内容が変わった年だけをビルドし直す）
+build_hugo_partitioned() {
+    cd "${HUGO_BLOG_DIR}"
+
+    if [[ ! -f config/_default/segments.toml ]]; then
+        error "config/_default/segments.toml がありません（convert.py --layout year-month で変換してください）"
+    fi
+
+    info "Building Hugo site by year (${BUILD_JOBS} parallel)..."
+
+    export HUGO_ENVIRONMENT=production
+    export TZ=Asia/Tokyo
+
+    local start=${SECONDS}
+    mkdir -p "${PARTITION_DIR}"
+
+    # 設定・テーマ・静的ファイルが変わったらすべてのセグメントをビルドし直す
+    local config_hash
+    config_hash=$(tree_hash hugo.toml config archetypes layouts assets static data i18n themes)
+    config_hash="${config_hash}:${BASE_URL}"
+
+    local years=()
+    local year_dir
+    for year_dir in content/posts/[0-9][0-9][0-9][0-9]; do
+        [[ -d "${year_dir}" ]] && years+=("$(basename "${year_dir}")")
+    done
+
+    # 各セグメントの現在のハッシュ（shell は一覧ページに全記事が載るのでコンテンツ全体）
+    declare -A hashes
+    local year
+    for year in "${years[@]}"; do
+        hashes["y${year}"]="${config_hash}:$(tree_hash "content/posts/${year}")"
+    done
+    hashes[shell]="${config_hash}:$(tree_hash content)"
+
+    # 前回から変わったセグメント
+    local stale=()
+    local segment
+    for segment in shell "${years[@]/#/y}"; do
+        mkdir -p "${PARTITION_DIR}/${segment}"
+        if [[ ! -d "${PARTITION_DIR}/${segment}/public" ]] || \
+           [[ "$(cat "${PARTITION_DIR}/${segment}/hash" 2>/dev/null)" != "${hashes[${segment}]}" ]]; then
+            rm -f "${PARTITION_DIR}/${segment}/hash"
+            stale+=("${segment}")
+        fi
+    done
+    info "Segments: $((${#years[@]} + 1)) (rebuild: ${#stale[@]}: ${stale[*]:-none})"
+
+    # なくなった年のセグメントを削除
+    local dir
+    for dir in "${PARTITION_DIR}"/*/; do
+        segment=$(basename "${dir}")
+        if [[ -z "${hashes[${segment}]+set}" ]]; then
+            rm -rf "${dir}"
+        fi
+    done
+
+    # shell を先にビルドし（テーマの CSS などの共有リソースを生成）、年は並列にビルドする
+    for segment in "${stale[@]}"; do
+        if [[ "${segment}" == shell ]]; then
+            render_segment shell "${hashes[shell]}"
+            continue
+        fi
+        render_segment "${segment}" "${hashes[${segment}]}" &
+        while (( $(jobs -rp | wc -l) >= BUILD_JOBS )); do
+            wait -n || true
+        done
+    done
+    wait
+
+    # ハッシュが記録されていないセグメントはビルドに失敗している（次回もビルドし直す）
+    local failed=0
+    for segment in "${stale[@]}"; do
+        if [[ ! -f "${PARTITION_DIR}/${segment}/hash" ]]; then
+            warn "Segment ${segment} failed:"
+            tail -n 20 "${PARTITION_DIR}/${segment}/build.log" || true
+            failed=1
+        fi
+    done
+    if [[ ${failed} -ne 0 ]]; then
+        error "Partitioned build failed"
+    fi
+
+    # 各セグメントの出力を public/ にまとめる（共通のファイルは shell のものを優先）
+    rm -rf public.tmp
+    mkdir -p public.tmp
+    for segment in "${years[@]/#/y}" shell; do
+        cp -a "${PARTITION_DIR}/${segment}/public/." public.tmp/
+    done
+    rm -rf public
+    mv public.tmp public
+
+    info "Build completed successfully! ($((SECONDS - start))s, rebuilt ${#stale[@]} segments)"
+    info "Output directory: ${HUGO_BLOG_DIR}/public"
+}
+
 # メイン処理
 main() {
+    local partitioned=0
+    case "${1:-}" in
+        --partitioned) partitioned=1 ;;
+        "") ;;
+        *) error "Unknown option: $1" ;;
+    esac
+
     info "Starting Hugo build process..."
 
     # Hugo の確認・インストール
@@ -114,7 +245,11 @@ main() {
     install_node_deps
 
     # Hugo ビルド
-    build_hugo
+    if [[ ${partitioned} -eq 1 ]]; then
+        build_hugo_partitioned
+    else
+        build_hugo
+    fi
 
     info "All done!"
 }
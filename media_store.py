@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""
+Page Bundle へのメディアファイル配置（コピー・ハードリンク・reflink・シンボリックリンク）と
+内容ハッシュで重複を排除するメディアストア
+"""
+
+import errno
+import hashlib
+import json
+import os
+import shutil
+import threading
+from pathlib import Path
+
+# 指定できる配置方法
+MEDIA_STRATEGIES = ('copy', 'hardlink', 'reflink', 'symlink')
+
+# Linux の FICLONE ioctl 番号（btrfs / XFS などで reflink を作成する）
+FICLONE = 0x40049409
+
+# これらのエラーは「この方法では配置できない」ことを意味するのでコピーに切り替える
+_FALLBACK_ERRNOS = {
+    errno.EXDEV, errno.EPERM, errno.EACCES, errno.EINVAL, errno.ENOTTY,
+    errno.EOPNOTSUPP, errno.ENOTSUP, errno.EMLINK, errno.ENOSYS,
+}
+
+
+def _reflink(src_path: str, dest_path: str):
+    """src_path を dest_path に reflink（データブロック共有のコピー）する"""
+    import fcntl
+
+    with open(src_path, 'rb') as src, open(dest_path, 'wb') as dest:
+        try:
+            fcntl.ioctl(dest.fileno(), FICLONE, src.fileno())
+        except OSError:
+            dest.close()
+            os.unlink(dest_path)
+            raise
+    shutil.copystat(src_path, dest_path)
+
+
+def materialize_media(src_path: str, dest_path: str, strategy: str = 'copy') -> tuple[str, int]:
+    """
+    メディアファイルを dest_path に配置する
+    指定の方法が使えない場合（別デバイス・非対応ファイルシステムなど）はコピーに切り替える
+    Returns: (実際に使った方法, コピーを省略できたバイト数)
+    """
+    if strategy not in MEDIA_STRATEGIES:
+        raise ValueError(f"不明なメディア配置方法です: {strategy}")
+
+    size = os.path.getsize(src_path)
+
+    if strategy == 'hardlink':
+        # 別デバイス間ではハードリンクできないので試すまでもない
+        if os.stat(src_path).st_dev == os.stat(os.path.dirname(dest_path) or '.').st_dev:
+            try:
+                os.link(src_path, dest_path)
+                return 'hardlink', size
+            except OSError as e:
+                if e.errno not in _FALLBACK_ERRNOS:
+                    raise
+    elif strategy == 'reflink':
+        try:
+            _reflink(src_path, dest_path)
+            return 'reflink', size
+        except (OSError, ImportError) as e:
+            if isinstance(e, OSError) and e.errno not in _FALLBACK_ERRNOS:
+                raise
+    elif strategy == 'symlink':
+        try:
+            os.symlink(os.path.abspath(src_path), dest_path)
+            return 'symlink', size
+        except OSError as e:
+            if e.errno not in _FALLBACK_ERRNOS:
+                raise
+
+    shutil.copy2(src_path, dest_path)
+    return 'copy', 0
+
+
+class MediaStore:
+    """
+    メディアファイルを内容の SHA-256 ごとに 1 つだけ保持するストア
+
+    root/objects/<先頭2文字>/<ダイジェスト><拡張子> に実体を置き、Page Bundle からは
+    materialize_media でそこを参照する。ハッシュ値は root/index.json に
+    （ソースパス, サイズ, mtime）単位で保存し、変化のないファイルは再計算しない。
+    """
+
+    INDEX_VERSION = 1
+
+    def __init__(self, root: Path):
+        self.root = Path(root)
+        self.objects_dir = self.root / 'objects'
+        self.index_path = self.root / 'index.json'
+        self._lock = threading.Lock()
+        self._index = self._load_index()
+        # 今回の実行で参照されたダイジェストとそのサイズ
+        self._seen = {}
+        self.stats = {
+            'hashed_files': 0,
+            'hashed_bytes': 0,
+            'index_hits': 0,
+            'stored_files': 0,
+            'stored_bytes': 0,
+            'duplicate_refs': 0,
+            'duplicate_bytes': 0,
+        }
+
+    def _load_index(self) -> dict:
+        if not self.index_path.exists():
+            return {}
+        with open(self.index_path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        if data.get('version') != self.INDEX_VERSION:
+            return {}
+        return data.get('files', {})
+
+    def save(self):
+        """ハッシュ索引を一時ファイル経由で書き出す"""
+        self.root.mkdir(parents=True, exist_ok=True)
+        with self._lock:
+            data = {'version': self.INDEX_VERSION, 'files': self._index}
+        tmp_path = self.index_path.with_name(self.index_path.name + '.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, sort_keys=True)
+        os.replace(tmp_path, self.index_path)
+
+    def digest(self, src_path: str) -> str:
+        """ファイル内容の SHA-256 を返す（サイズと mtime が同じなら索引の値を再利用）"""
+        key = os.path.abspath(src_path)
+        st = os.stat(src_path)
+        with self._lock:
+            entry = self._index.get(key)
+            if entry and entry['size'] == st.st_size and entry['mtime_ns'] == st.st_mtime_ns:
+                self.stats['index_hits'] += 1
+                return entry['sha256']
+
+        h = hashlib.sha256()
+        with open(src_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                h.update(chunk)
+        digest = h.hexdigest()
+
+        with self._lock:
+            self._index[key] = {'size': st.st_size, 'mtime_ns': st.st_mtime_ns, 'sha256': digest}
+            self.stats['hashed_files'] += 1
+            self.stats['hashed_bytes'] += st.st_size
+        return digest
+
+    def store(self, src_path: str) -> str:
+        """src_path をストアに取り込み、ストア内の実体のパスを返す"""
+        digest = self.digest(src_path)
+        size = os.path.getsize(src_path)
+        ext = os.path.splitext(src_path)[1].lower()
+        object_path = self.objects_dir / digest[:2] / f"{digest}{ext}"
+
+        with self._lock:
+            if digest in self._seen:
+                self.stats['duplicate_refs'] += 1
+                self.stats['duplicate_bytes'] += size
+            self._seen[digest] = size
+
+        if not object_path.exists():
+            object_path.parent.mkdir(parents=True, exist_ok=True)
+            # 並列に同じ内容を取り込んでも壊れないよう、一時ファイルから置き換える
+            tmp_path = object_path.with_name(f"{object_path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+            shutil.copy2(src_path, tmp_path)
+            os.replace(tmp_path, object_path)
+            with self._lock:
+                self.stats['stored_files'] += 1
+                self.stats['stored_bytes'] += size
+
+        return str(object_path)
+
+    def summary(self) -> str:
+        """実行結果の概要"""
+        mb = 1 << 20
+        st = self.stats
+        return (f"ハッシュ計算 {st['hashed_files']} 件 ({st['hashed_bytes'] / mb:.1f} MB), "
+                f"索引再利用 {st['index_hits']} 件, "
+                f"新規格納 {st['stored_files']} 件 ({st['stored_bytes'] / mb:.1f} MB), "
+                f"重複 {st['duplicate_refs']} 件 ({st['duplicate_bytes'] / mb:.1f} MB)")
@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+"""
+投稿ディレクトリ（Page Bundle）の移動をまとめて計画・実行する
+
+移動元・移動先のディレクトリの組ごとに 1 回だけデバイス番号を確かめ、
+同じファイルシステム内なら os.rename で 1 件ずつアトミックに移動する
+（st_dev が同じでも rename が EXDEV で失敗した場合はコピーに切り替える）。
+異なるファイルシステム間（WSL の /mnt/g とローカルディスクなど）では、
+移動先の一時ディレクトリに並列でコピーし、ファイルの一覧とサイズを照合してから
+rename で置き換え、最後に移動元を削除する。
+"""
+
+import errno
+import os
+import shutil
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable
+
+
+def same_device(src_dir: Path, dest_dir: Path) -> bool:
+    """2 つのディレクトリが同じファイルシステム上にあるか（移動元がなければ True）"""
+    try:
+        return os.stat(src_dir).st_dev == os.stat(dest_dir).st_dev
+    except FileNotFoundError:
+        return True
+
+
+def copy_verified(src: Path, dest: Path) -> int:
+    """
+    src を dest にコピーし、ファイルの一覧とサイズが一致するか確かめる
+    Returns: コピーしたバイト数
+    """
+    shutil.copytree(src, dest, copy_function=shutil.copy2)
+    copied = 0
+    for root, _, files in os.walk(src):
+        rel = os.path.relpath(root, src)
+        for name in files:
+            size = os.path.getsize(os.path.join(root, name))
+            try:
+                dest_size = os.path.getsize(os.path.join(dest, rel, name))
+            except OSError:
+                dest_size = None
+            if dest_size != size:
+                raise OSError(f"コピーの検証に失敗しました: {os.path.join(rel, name)}")
+            copied += size
+    return copied
+
+
+def _replace(staging_path: Path, dest_path: Path, old_path: Path):
+    """一時ディレクトリを移動先の名前に置き換える（既存のものは退避してから削除する）"""
+    if dest_path.exists():
+        if old_path.exists():
+            shutil.rmtree(old_path)
+        os.rename(dest_path, old_path)
+        os.rename(staging_path, dest_path)
+        shutil.rmtree(old_path)
+    else:
+        os.rename(staging_path, dest_path)
+
+
+def move_bundle(src: Path, dest_dir: Path, cross_device: bool = None) -> int:
+    """
+    投稿ディレクトリ 1 件を dest_dir に移動する
+    途中で中断しても移動元・移動先のどちらかに完全な投稿が残り、再実行すると続きから完了する
+    cross_device を省略した場合はその場で判定する
+    Returns: コピーしたバイト数（rename で移動した場合は 0）
+    """
+    dest_dir.mkdir(parents=True, exist_ok=True)
+    dest_path = dest_dir / src.name
+    staging_path = dest_dir / f".{src.name}.moving"
+    old_path = dest_dir / f".{src.name}.old"
+    if cross_device is None:
+        cross_device = not same_device(src.parent, dest_dir)
+
+    copied = 0
+    if src.exists():
+        if staging_path.exists():
+            shutil.rmtree(staging_path)
+        if cross_device:
+            # 検証済みのコピーを置き換えてから移動元を消す
+            copied = copy_verified(src, staging_path)
+            _replace(staging_path, dest_path, old_path)
+            shutil.rmtree(src)
+            return copied
+        if not dest_path.exists():
+            os.rename(src, dest_path)
+            return 0
+        os.rename(src, staging_path)
+    elif not staging_path.exists():
+        if dest_path.exists():
+            return 0
+        raise FileNotFoundError(f"投稿フォルダが見つかりません: {src}")
+
+    _replace(staging_path, dest_path, old_path)
+    return copied
+
+
+class MovePlan:
+    """投稿ディレクトリの移動をまとめ、移動元・移動先の組ごとに方法を決めて実行する"""
+
+    def __init__(self, jobs: int = 4):
+        self.jobs = jobs
+        # (移動元の親, 移動先) → 移動元の一覧
+        self.groups = {}
+        # (移動元の親, 移動先) → 異なるファイルシステムか
+        self._cross_device = {}
+        self.stats = {'renamed': 0, 'copied': 0, 'bytes': 0, 'failed': 0, 'elapsed': 0.0}
+
+    def __len__(self) -> int:
+        return sum(len(sources) for sources in self.groups.values())
+
+    def add(self, src: Path, dest_dir: Path):
+        """移動を予約する"""
+        self.groups.setdefault((src.parent, dest_dir), []).append(src)
+
+    def _prepare(self):
+        """移動先を作成し、組ごとに 1 回だけデバイス番号を比べる"""
+        for key in self.groups:
+            if key not in self._cross_device:
+                src_parent, dest_dir = key
+                dest_dir.mkdir(parents=True, exist_ok=True)
+                self._cross_device[key] = not same_device(src_parent, dest_dir)
+
+    def describe(self) -> str:
+        """移動計画の一覧"""
+        self._prepare()
+        lines = [f"移動計画: {len(self)} 件"]
+        for (src_parent, dest_dir), sources in self.groups.items():
+            method = 'コピー→検証→削除' if self._cross_device[(src_parent, dest_dir)] else 'rename'
+            lines.append(f"  {src_parent} → {dest_dir}: {len(sources)} 件 ({method})")
+        return '\n'.join(lines)
+
+    def execute(self, on_moved: Callable[[Path, Path], None] = None, progress: int = 500) -> dict:
+        """
+        予約した移動を実行する（失敗した移動は表示して残りを続ける）
+        on_moved(移動元, 移動先ディレクトリ) は移動が完了した投稿ごとに主スレッドで呼ぶ
+        """
+        self._prepare()
+        start = time.perf_counter()
+        done = 0
+        total = len(self)
+
+        def finish(src: Path, dest_dir: Path, error: Exception = None):
+            nonlocal done
+            done += 1
+            if error is not None:
+                print(f"  移動に失敗しました: {src.name}: {error}")
+                self.stats['failed'] += 1
+            elif on_moved is not None:
+                on_moved(src, dest_dir)
+            if progress and done % progress == 0:
+                print(f"  {done}/{total} 件移動完了...")
+
+        executor = None
+        try:
+            for (src_parent, dest_dir), sources in self.groups.items():
+                if not self._cross_device[(src_parent, dest_dir)]:
+                    for src in sources:
+                        try:
+                            try:
+                                move_bundle(src, dest_dir, cross_device=False)
+                                self.stats['renamed'] += 1
+                            except OSError as e:
+                                # バインドマウントやオーバーレイは st_dev が同じでも rename できないことがある
+                                if e.errno != errno.EXDEV:
+                                    raise
+                                self.stats['bytes'] += move_bundle(src, dest_dir, cross_device=True)
+                                self.stats['copied'] += 1
+                        except OSError as e:
+                            finish(src, dest_dir, e)
+                            continue
+                        finish(src, dest_dir)
+                    continue
+
+                if executor is None:
+                    executor = ThreadPoolExecutor(max_workers=self.jobs)
+                futures = [(src, executor.submit(move_bundle, src, dest_dir, True))
+                           for src in sources]
+                for src, future in futures:
+                    try:
+                        self.stats['bytes'] += future.result()
+                        self.stats['copied'] += 1
+                    except OSError as e:
+                        finish(src, dest_dir, e)
+                        continue
+                    finish(src, dest_dir)
+        finally:
+            if executor is not None:
+                executor.shutdown()
+            self.stats['elapsed'] += time.perf_counter() - start
+        return self.stats
+
+    def summary(self) -> str:
+        """実行結果の概要"""
+        st = self.stats
+        moved = st['renamed'] + st['copied']
+        elapsed = st['elapsed']
+        rate = moved / elapsed if elapsed else 0.0
+        mb = st['bytes'] / (1 << 20)
+        line = (f"移動 {moved} 件 (rename {st['renamed']} 件, コピー {st['copied']} 件 "
+                f"{mb:.1f} MB), {elapsed:.1f} 秒, {rate:.0f} 件/s")
+        if st['copied'] and elapsed:
+            line += f", {mb / elapsed:.1f} MB/s"
+        if st['failed']:
+            line += f", 失敗 {st['failed']} 件"
+        return line
@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+"""
+変換 → 分類 → 出版社 URL による自動公開を 1 回で行うスクリプト
+
+convert.py で候補ディレクトリに書き出し、classify_books.py と review_posts.py が
+読み直して移動する代わりに、変換した記事をメモリ上で分類し、最終的な振り分け先へ
+1 回だけ書き出す。個別のスクリプトはこれまでどおり既存のディレクトリに使える。
+
+振り分け先:
+  公開（書籍関連 + 出版社 URL）: hugo-blog/content/posts
+  確認待ち（書籍関連）:          hugo-blog-content-candidate
+  可能性あり:                    hugo-blog-content-suspicious-candidate
+  書籍関連なし:                  hugo-blog-content-nonpublish
+
+使い方:
+  python pipeline.py [--export PATH ...] [--jobs N] [--index PATH] [--enrich]
+"""
+
+import argparse
+import os
+from pathlib import Path
+
+from convert import convert_posts_to_hugo, discover_export_shards
+from corpus_index import CorpusIndex
+from review_posts import DecisionJournal, find_publisher_domain
+
+# 振り分け先（BASE_DIR からの相対パス）。既存の投稿を探すときはこの順で優先する
+ROUTE_DIRS = {
+    'published': Path('hugo-blog') / 'content' / 'posts',
+    'nonpublish': Path('hugo-blog-content-nonpublish'),
+    'candidate': Path('hugo-blog-content-candidate'),
+    'suspicious': Path('hugo-blog-content-suspicious-candidate'),
+}
+
+
+def route_for(verdict: str, publisher: str = None) -> str:
+    """分類結果と出版社 URL の有無から振り分け先を決める"""
+    if verdict == 'definite':
+        return 'published' if publisher else 'candidate'
+    if verdict == 'suspicious':
+        return 'suspicious'
+    return 'nonpublish'
+
+
+class PostRouter:
+    """
+    convert_posts_to_hugo の router。投稿ごとに書き出し先のディレクトリを返す
+    すでにいずれかの振り分け先にある投稿（手動で振り分けたものなど）はその場所に書き出す
+    """
+
+    def __init__(self, base_dir: Path):
+        self.dirs = {route: base_dir / path for route, path in ROUTE_DIRS.items()}
+        # 振り分け済みの投稿のディレクトリ名 → 振り分け先（起動時に 1 回だけ一覧する）
+        self.existing = {}
+        for route, route_dir in reversed(self.dirs.items()):
+            if route_dir.is_dir():
+                with os.scandir(route_dir) as it:
+                    self.existing.update((entry.name, route) for entry in it if entry.is_dir())
+        # (ディレクトリ名, 振り分け先, 分類結果, 既存の場所を維持したか)
+        self.decisions = []
+        self.stats = dict.fromkeys(self.dirs, 0)
+        self.kept = 0
+
+    def __call__(self, dirname: str, rendered: dict) -> Path:
+        verdict = rendered['verdict']
+        publisher = None
+        if verdict == 'definite':
+            publisher = find_publisher_domain(rendered['frontmatter'] + rendered['content'])
+        route = route_for(verdict, publisher)
+
+        existing = self.existing.get(dirname)
+        kept = existing is not None and existing != route
+        if kept:
+            route = existing
+            self.kept += 1
+        self.stats[route] += 1
+        self.decisions.append((dirname, route, verdict, kept))
+        return self.dirs[route]
+
+    def record_journal(self, journal: DecisionJournal, decisions: dict[str, dict]) -> int:
+        """
+        review_posts.py と同じ形式で自動公開・確認待ちをジャーナルに記録する
+        （review_posts.py は記録済みの投稿の出版社 URL 判定をやり直さない）
+        ジャーナルに記録済みの投稿と既存の場所を維持した投稿は記録しない
+        """
+        candidate_dir = self.dirs['candidate']
+        recorded = 0
+        for dirname, route, _, kept in self.decisions:
+            if kept or dirname in decisions:
+                continue
+            if route == 'published':
+                journal.record(candidate_dir / dirname, 'publish', self.dirs['published'], auto=True)
+            elif route == 'candidate':
+                journal.record(candidate_dir / dirname, 'pending', auto=True)
+            else:
+                continue
+            recorded += 1
+        return recorded
+
+    def update_index(self, index: CorpusIndex):
+        """分類結果と振り分け先を索引に記録する"""
+        for dirname, route, verdict, kept in self.decisions:
+            index.set_verdict(dirname, verdict)
+            if route == 'published' and not kept:
+                index.set_location(dirname, self.dirs['published'], 'published')
+        index.commit()
+
+    def report(self) -> str:
+        """振り分け結果の概要"""
+        labels = {
+            'published': '自動公開',
+            'candidate': '確認待ち',
+            'suspicious': '可能性あり',
+            'nonpublish': '書籍関連なし',
+        }
+        lines = [f"  {labels[route]}: {self.stats[route]} 件 ({ROUTE_DIRS[route]}/)"
+                 for route in labels]
+        if self.kept:
+            lines.append(f"  振り分け済みの場所を維持: {self.kept} 件")
+        return '\n'.join(lines)
+
+
+def parse_args(argv: list[str] = None) -> argparse.Namespace:
+    """コマンドライン引数を解析"""
+    parser = argparse.ArgumentParser(description='変換・分類・自動公開を 1 回で行います')
+    parser.add_argument('--base-dir', type=Path, default=Path(__file__).parent,
+                        help='hugo-blog や hugo-blog-content-candidate などを置くディレクトリ')
+    parser.add_argument('--export', type=Path, action='append', default=None, metavar='PATH',
+                        help='読み込むエクスポート（convert.py --export と同じ。'
+                             '既定: BASE_DIR/your_facebook_activity）')
+    parser.add_argument('--stream', action='store_true',
+                        help='JSON を投稿 1 件ずつ読み込む（巨大なエクスポート向け）')
+    parser.add_argument('--jobs', type=int, default=1, metavar='N',
+                        help='記事生成・分類とメディアコピーを N 並列で行う')
+    parser.add_argument('--index', type=Path, default=None, metavar='PATH',
+                        help='書き出した投稿・分類結果・振り分け先を登録するコーパス索引（SQLite）')
+    parser.add_argument('--journal', type=Path, default=None, metavar='PATH',
+                        help='自動公開・確認待ちを記録する振り分けジャーナル'
+                             '（既定: BASE_DIR/review-journal.jsonl）')
+    parser.add_argument('--enrich', action='store_true',
+                        help='タグ・出版社・ISBN・分類結果をフロントマターに書き出す')
+    parser.add_argument('--skip-unchanged', action='store_true',
+                        help='内容が同じ index.md は書き直さない')
+    return parser.parse_args(argv)
+
+
+def main():
+    args = parse_args()
+
+    base_dir = args.base_dir
+    exports = args.export or [base_dir / 'your_facebook_activity']
+    shards = discover_export_shards(exports)
+    if not shards:
+        print(f"エラー: 入力ファイルが見つかりません: {', '.join(map(str, exports))}")
+        return 1
+    input_json, source_base = shards[0]
+
+    print("Facebook データを変換・分類して振り分けます...")
+    for json_path, _ in shards:
+        print(f"入力: {json_path}")
+    print(f"出力: {base_dir}")
+
+    router = PostRouter(base_dir)
+    index = CorpusIndex(args.index) if args.index else None
+    try:
+        count = convert_posts_to_hugo(input_json, base_dir / 'hugo-blog', source_base,
+                                      stream=args.stream, jobs=args.jobs, corpus_index=index,
+                                      skip_unchanged=args.skip_unchanged, enrich=args.enrich,
+                                      shards=shards, router=router)
+        if index is not None:
+            router.update_index(index)
+    finally:
+        if index is not None:
+            index.close()
+
+    journal_path = args.journal or base_dir / 'review-journal.jsonl'
+    decisions = DecisionJournal.replay(journal_path)
+    journal = DecisionJournal(journal_path)
+    try:
+        recorded = router.record_journal(journal, decisions)
+    finally:
+        journal.close()
+
+    print(f"\n完了! {count} 件の投稿を振り分けました。")
+    print(router.report())
+    print(f"  ジャーナルに記録: {recorded} 件 ({journal_path})")
+    return 0
+
+
+if __name__ == '__main__':
+    exit(main())
@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+"""
+変換処理の段階ごとの計測（所要時間・呼び出し回数・バイト数）
+
+既定では無効で、stage() は何もしないコンテキストマネージャを返すだけ。
+enable() で Profiler を有効にすると、集計表・Chrome のトレースイベント JSON・
+投稿の範囲を絞った cProfile のダンプを出力できる。
+"""
+
+import cProfile
+import functools
+import json
+import os
+import threading
+import time
+from typing import Iterable, Iterator
+
+# 有効な計測器（無効時は None）
+_profiler = None
+
+
+class _NullStage:
+    """計測無効時に stage() が返す何もしないコンテキストマネージャ"""
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def add(self, nbytes: int):
+        pass
+
+    def add_file(self, path):
+        pass
+
+
+_NULL_STAGE = _NullStage()
+
+
+class _Stage:
+    """1 回分の段階の計測"""
+
+    __slots__ = ('profiler', 'name', 'start', 'nbytes')
+
+    def __init__(self, profiler: 'Profiler', name: str, nbytes: int = 0):
+        self.profiler = profiler
+        self.name = name
+        self.nbytes = nbytes
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc):
+        self.profiler.record(self.name, self.start, time.perf_counter_ns(), self.nbytes)
+        return False
+
+    def add(self, nbytes: int):
+        """処理したバイト数を加算"""
+        self.nbytes += nbytes
+
+    def add_file(self, path):
+        """書き出したファイルのサイズを加算"""
+        try:
+            self.nbytes += os.path.getsize(path)
+        except OSError:
+            pass
+
+
+class Profiler:
+    """段階ごとの所要時間・呼び出し回数・バイト数を集計する"""
+
+    def __init__(self, trace: bool = False, post_range: tuple[int, int] = None,
+                 max_events: int = 1_000_000):
+        # 段階名 → [呼び出し回数, 合計ナノ秒, バイト数]
+        self.totals = {}
+        self.events = [] if trace else None
+        self.max_events = max_events
+        self.dropped_events = 0
+        self.post_range = post_range
+        self.cprofile = cProfile.Profile() if post_range else None
+        self._lock = threading.Lock()
+        self._origin = time.perf_counter_ns()
+        self._wall_start = self._origin
+
+    def stage(self, name: str, nbytes: int = 0) -> _Stage:
+        return _Stage(self, name, nbytes)
+
+    def record(self, name: str, start: int, end: int, nbytes: int = 0):
+        with self._lock:
+            total = self.totals.get(name)
+            if total is None:
+                total = self.totals[name] = [0, 0, 0]
+            total[0] += 1
+            total[1] += end - start
+            total[2] += nbytes
+            if self.events is not None:
+                if len(self.events) < self.max_events:
+                    self.events.append((name, start, end, threading.get_ident(), nbytes))
+                else:
+                    self.dropped_events += 1
+
+    def scope_posts(self, posts: Iterable) -> Iterator:
+        """
+        投稿を順に返しつつ、post_range（0 始まり、終端を含まない）の間だけ cProfile を有効にする
+        cProfile は呼び出したスレッドしか計測しないため、並列実行時は主スレッドの処理だけが対象
+        """
+        start, end = self.post_range
+        active = False
+        try:
+            for i, post in enumerate(posts):
+                if i == start and not active:
+                    self.cprofile.enable()
+                    active = True
+                elif i == end and active:
+                    self.cprofile.disable()
+                    active = False
+                yield post
+        finally:
+            if active:
+                self.cprofile.disable()
+
+    def summary(self) -> str:
+        """段階ごとの集計表（時間は入れ子の段階を含む）"""
+        wall = (time.perf_counter_ns() - self._wall_start) / 1e9
+        lines = [f"{'段階':<20} {'回数':>10} {'合計(秒)':>10} {'平均(µs)':>10} {'MB':>10}"]
+        with self._lock:
+            rows = sorted(self.totals.items(), key=lambda item: item[1][1], reverse=True)
+        for name, (calls, ns, nbytes) in rows:
+            lines.append(f"{name:<20} {calls:>10} {ns / 1e9:>10.3f} "
+                         f"{ns / calls / 1e3:>10.1f} {nbytes / (1 << 20):>10.1f}")
+        lines.append(f"経過時間: {wall:.3f} 秒")
+        if self.dropped_events:
+            lines.append(f"トレースの上限を超えたため {self.dropped_events} 件のイベントを省略しました")
+        return '\n'.join(lines)
+
+    def write_trace(self, path):
+        """Chrome のトレースイベント形式（chrome://tracing, Perfetto で表示できる）で書き出す"""
+        pid = os.getpid()
+        events = []
+        for name, start, end, tid, nbytes in self.events or ():
+            event = {
+                'name': name,
+                'ph': 'X',
+                'ts': (start - self._origin) / 1e3,
+                'dur': (end - start) / 1e3,
+                'pid': pid,
+                'tid': tid,
+            }
+            if nbytes:
+                event['args'] = {'bytes': nbytes}
+            events.append(event)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f)
+
+    def dump_cprofile(self, path):
+        """post_range の cProfile の結果を pstats 形式で書き出す"""
+        if self.cprofile is not None:
+            self.cprofile.dump_stats(path)
+
+
+def enable(profiler: Profiler):
+    global _profiler
+    _profiler = profiler
+
+
+def disable():
+    global _profiler
+    _profiler = None
+
+
+def active() -> Profiler:
+    """有効な計測器（無効時は None）"""
+    return _profiler
+
+
+def stage(name: str, nbytes: int = 0):
+    """段階を計測するコンテキストマネージャ（無効時はほぼ何もしない）"""
+    if _profiler is None:
+        return _NULL_STAGE
+    return _profiler.stage(name, nbytes)
+
+
+def instrument(namespace: dict, names: Iterable[str]) -> dict:
+    """
+    namespace（モジュールの globals()）の関数を計測付きのものに差し替える
+    文字列を受け取る関数は引数の長さをバイト数として記録する
+    Returns: 元に戻すための元の関数
+    """
+    originals = {}
+    for name in names:
+        func = namespace[name]
+
+        @functools.wraps(func)
+        def wrapper(*args, _func=func, _name=name, **kwargs):
+            profiler = _profiler
+            if profiler is None:
+                return _func(*args, **kwargs)
+            nbytes = len(args[0]) if args and isinstance(args[0], str) else 0
+            with profiler.stage(_name, nbytes):
+                return _func(*args, **kwargs)
+
+        originals[name] = func
+        namespace[name] = wrapper
+    return originals
+
+
+def restore(namespace: dict, originals: dict):
+    """instrument で差し替えた関数を元に戻す"""
+    namespace.update(originals)
+
+
+def parse_range(text: str) -> tuple[int, int]:
+    """'START:END' 形式の投稿範囲（0 始まり、END は含まない）を解析"""
+    start, _, end = text.partition(':')
+    start = int(start) if start else 0
+    end = int(end) if end else 1 << 62
+    if start < 0 or end <= start:
+        raise ValueError(f"投稿の範囲が不正です: {text}")
+    return start, end
@@ -13,10 +13,19 @@
   q : 終了
 """
 
+import argparse
+import json
 import os
-import shutil
+import re
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime
 from pathlib import Path
 
+from bundle_archive import BundleArchive
+from corpus_index import CorpusIndex
+from dedup_posts import MinHasher, SignatureCache, cluster_lookup, find_clusters
+from move_planner import MovePlan, move_bundle
+
 PUBLISHER_DOMAINS = [
     'www.chikumashobo.co.jp',
     'www.kinokuniya.co.jp',
@@ -204,7 +213,14 @@ PUBLISHER_DOMAINS = [
 
 
 def clear_screen():
-    os.system('cls' if os.name == 'nt' else 'clear')
+    # サブプロセスを起動せず、端末制御シーケンスで画面を消去する
+    print('\033[2J\033[H', end='', flush=True)
+
+
+def enable_ansi_escapes():
+    """Windows のコンソールで端末制御シーケンスを有効にする"""
+    if os.name == 'nt':
+        os.system('')
 
 
 def get_pending_posts(source_dir: Path) -> list[Path]:
@@ -230,75 +246,418 @@ def get_post_content(post_dir: Path) -> str:
     return content
 
 
-def contains_publisher_url(content: str) -> bool:
-    """出版社サイトへのURLが含まれているかチェック"""
-    for domain in PUBLISHER_DOMAINS:
-        if domain in content:
-            return True
-    return False
+def build_trie_regex(words: list[str]) -> re.Pattern:
+    """
+    文字列群をトライ木に畳み込んだ正規表現を作る
+    各位置で先頭の文字から 1 本の枝だけをたどるので、語数に比例した照合にならない。
+    語の終端は貪欲な省略可能グループにするため、同じ位置では最長の語に一致する
+    """
+    trie = {}
+    for word in words:
+        node = trie
+        for ch in word:
+            node = node.setdefault(ch, {})
+        node[''] = True
 
+    def build(node: dict) -> str:
+        branches = [re.escape(ch) + build(child) for ch, child in sorted(node.items()) if ch]
+        if not branches:
+            return ''
+        body = branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+        if '' in node:
+            body = '(?:' + body + ')?'
+        return body
 
-def move_post(post_dir: Path, dest_dir: Path):
-    """投稿フォルダを移動"""
-    dest_dir.mkdir(parents=True, exist_ok=True)
-    dest_path = dest_dir / post_dir.name
+    return re.compile(build(trie))
+
+
+# 出版社ドメインの照合器（重複は除く）
+PUBLISHER_MATCHER = build_trie_regex(sorted(set(PUBLISHER_DOMAINS)))
+
+
+def find_publisher_domain(content: str) -> str:
+    """
+    本文中で最初に現れる出版社ドメインを返す（なければ None）
+    同じ位置で複数が一致する場合は、パス付きのものなど最も長いものを返す
+    """
+    m = PUBLISHER_MATCHER.search(content)
+    return m.group(0) if m else None
 
-    if dest_path.exists():
-        shutil.rmtree(dest_path)
 
-    shutil.move(str(post_dir), str(dest_path))
-    return dest_path
+def find_publisher_domains(content: str) -> list[str]:
+    """本文中の出版社ドメインを出現順に重複なく返す"""
+    return list(dict.fromkeys(PUBLISHER_MATCHER.findall(content)))
 
 
-def auto_publish_by_url(posts: list[Path], publish_dir: Path) -> tuple[list[Path], int]:
-    """出版社URLを含む投稿を自動で公開フォルダに移動"""
+def contains_publisher_url(content: str) -> bool:
+    """出版社サイトへのURLが含まれているかチェック"""
+    return PUBLISHER_MATCHER.search(content) is not None
+
+
+def move_post(post_dir: Path, dest_dir: Path):
+    """
+    投稿フォルダを移動
+    同じファイルシステム内なら rename、異なる場合は検証付きのコピー後に削除する。
+    途中で中断しても移動元・移動先のどちらかに完全な投稿が残る。移動済みの投稿に対しては何もしない
+    """
+    move_bundle(post_dir, dest_dir)
+    return dest_dir / post_dir.name
+
+
+class DecisionJournal:
+    """
+    振り分け結果の追記専用ジャーナル（1 行 1 件の JSON）
+
+    記録は都度 flush し、fsync は fsync_every 件ごとと close 時にまとめて行う。
+    起動時に replay で読み直すと、投稿本文を読まずに前回の続きから再開できる。
+    """
+
+    ACTIONS = ('publish', 'nonpublish', 'skip', 'pending')
+
+    def __init__(self, path: Path, fsync_every: int = 16):
+        self.path = path
+        self.fsync_every = fsync_every
+        self._unsynced = 0
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._file = open(path, 'a', encoding='utf-8')
+
+    def record(self, post_dir: Path, action: str, dest_dir: Path = None, auto: bool = False):
+        """振り分け結果を 1 件追記する"""
+        if action not in self.ACTIONS:
+            raise ValueError(f"不明な操作です: {action}")
+        entry = {
+            'ts': datetime.now().isoformat(timespec='seconds'),
+            'post': post_dir.name,
+            'action': action,
+            'source': str(post_dir.parent),
+        }
+        if dest_dir is not None:
+            entry['dest'] = str(dest_dir)
+        if auto:
+            entry['auto'] = True
+        self._file.write(json.dumps(entry, ensure_ascii=False) + '\n')
+        self._file.flush()
+        self._unsynced += 1
+        if self._unsynced >= self.fsync_every:
+            self.sync()
+
+    def sync(self):
+        os.fsync(self._file.fileno())
+        self._unsynced = 0
+
+    def close(self):
+        if self._file.closed:
+            return
+        self.sync()
+        self._file.close()
+
+    @staticmethod
+    def replay(path: Path) -> dict[str, dict]:
+        """ジャーナルを読み、投稿ごとの最後の記録を返す（途中で切れた最終行は無視する）"""
+        decisions = {}
+        if not path.exists():
+            return decisions
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                decisions[entry['post']] = entry
+        return decisions
+
+
+def apply_journal(decisions: dict[str, dict], jobs: int = 4) -> dict[str, int]:
+    """
+    ジャーナルの記録をまとめて適用し、結果ごとの件数を返す
+    移動はまとめて計画し、同じファイルシステム内は rename、異なる場合は jobs 並列のコピーで行う
+    """
+    stats = {'moved': 0, 'done': 0, 'missing': 0, 'none': 0}
+    plan = MovePlan(jobs)
+    for entry in decisions.values():
+        if entry['action'] not in ('publish', 'nonpublish'):
+            stats['none'] += 1
+            continue
+        post_dir = Path(entry['source']) / entry['post']
+        dest_dir = Path(entry['dest'])
+        if not post_dir.exists() and not (dest_dir / f".{entry['post']}.moving").exists():
+            if (dest_dir / entry['post']).exists():
+                stats['done'] += 1
+            else:
+                stats['missing'] += 1
+                print(f"  見つかりません: {entry['post']}")
+            continue
+        plan.add(post_dir, dest_dir)
+
+    if plan:
+        print(plan.describe())
+        plan.execute()
+        print(f"  {plan.summary()}")
+        stats['moved'] = plan.stats['renamed'] + plan.stats['copied']
+    return stats
+
+
+class PostPrefetcher:
+    """次に表示する投稿の内容をバックグラウンドのスレッドで先読みする"""
+
+    def __init__(self, lookahead: int = 8, loader=get_post_content):
+        self.lookahead = lookahead
+        self.loader = loader
+        self._executor = ThreadPoolExecutor(max_workers=1)
+        self._futures = {}
+
+    def prefetch(self, posts: list[Path]):
+        """
+        先頭から lookahead 件の読み込みを予約する
+        範囲から外れた投稿（まとめて振り分けた類似投稿など）の予約は取り消す
+        """
+        window = posts[:self.lookahead]
+        keep = set(window)
+        for post in [p for p in self._futures if p not in keep]:
+            self._futures.pop(post).cancel()
+        for post in window:
+            if post not in self._futures:
+                self._futures[post] = self._executor.submit(self.loader, post)
+
+    def get(self, post: Path) -> str:
+        """投稿内容を返す（先読み済みなら待たない）"""
+        future = self._futures.pop(post, None)
+        if future is None:
+            return self.loader(post)
+        return future.result()
+
+    def close(self):
+        self._executor.shutdown(cancel_futures=True)
+
+
+class BackgroundMover:
+    """投稿フォルダの移動をキューに積み、バックグラウンドのスレッドで順に実行する"""
+
+    def __init__(self):
+        self._executor = ThreadPoolExecutor(max_workers=1)
+        self._pending: list[tuple[Path, Future]] = []
+
+    def move(self, post_dir: Path, dest_dir: Path) -> Path:
+        """移動を予約し、移動後のパスを返す"""
+        self._pending.append((post_dir, self._executor.submit(move_post, post_dir, dest_dir)))
+        return dest_dir / post_dir.name
+
+    def report_failures(self) -> int:
+        """完了した移動のうち失敗したものを表示する"""
+        failures = 0
+        still_pending = []
+        for post_dir, future in self._pending:
+            if not future.done():
+                still_pending.append((post_dir, future))
+            elif future.exception() is not None:
+                print(f"  移動に失敗しました: {post_dir.name}: {future.exception()}")
+                failures += 1
+        self._pending = still_pending
+        return failures
+
+    def close(self) -> int:
+        """すべての移動の完了を待ち、失敗した件数を返す"""
+        self._executor.shutdown(wait=True)
+        return self.report_failures()
+
+
+class RecordOnlyMover:
+    """移動は行わず移動後のパスだけを返す（アーカイブ内の投稿の確認用。実際の移動はジャーナルで行う）"""
+
+    def move(self, post_dir: Path, dest_dir: Path) -> Path:
+        return dest_dir / post_dir.name
+
+    def report_failures(self) -> int:
+        return 0
+
+    def close(self) -> int:
+        return 0
+
+
+def auto_publish_by_url(
+    posts: list[Path],
+    publish_dir: Path,
+    journal: DecisionJournal = None,
+    publishers: dict[str, str] = None,
+    loader=get_post_content,
+    move: bool = True
+) -> tuple[list[Path], int]:
+    """
+    出版社URLを含む投稿を自動で公開フォルダに移動
+    publishers（投稿名→ドメイン、コーパス索引から取得）を渡した場合は本文を読まない
+    move=False の場合はジャーナルへの記録だけを行う
+    移動はジャーナルへの記録後にまとめて行う（中断した場合は次回起動時にジャーナルから適用される）
+    """
     remaining = []
     auto_published = 0
+    plan = MovePlan()
 
     for post in posts:
-        content = get_post_content(post)
-        if contains_publisher_url(content):
-            dest = move_post(post, publish_dir)
+        if publishers is not None:
+            has_publisher = post.name in publishers
+        else:
+            has_publisher = contains_publisher_url(loader(post))
+        if has_publisher:
+            if journal is not None:
+                journal.record(post, 'publish', publish_dir, auto=True)
+            if move:
+                plan.add(post, publish_dir)
             print(f"  自動公開: {post.name}")
             auto_published += 1
         else:
+            if journal is not None:
+                # 判定済みであることを記録し、再開時に本文を読み直さないようにする
+                journal.record(post, 'pending', auto=True)
             remaining.append(post)
 
+    if plan:
+        if journal is not None:
+            journal.sync()
+        print(plan.describe())
+        plan.execute()
+        print(f"  {plan.summary()}")
     return remaining, auto_published
 
 
+def take_cluster_siblings(post: Path, posts: list[Path], clusters: dict[str, list[str]]) -> list[Path]:
+    """post と同じクラスタに属する未処理の投稿を posts から取り除いて返す"""
+    cluster = clusters.get(post.name)
+    if not cluster:
+        return []
+    names = set(cluster) - {post.name}
+    siblings = [p for p in posts if p.name in names]
+    posts[:] = [p for p in posts if p.name not in names]
+    return siblings
+
+
+def parse_args(argv: list[str] = None) -> argparse.Namespace:
+    """コマンドライン引数を解析"""
+    parser = argparse.ArgumentParser(description='書籍感想・批評 振り分けツール')
+    parser.add_argument('--journal', type=Path, default=None, metavar='PATH',
+                        help='振り分け結果のジャーナル（既定: review-journal.jsonl）')
+    parser.add_argument('--apply-journal', type=Path, default=None, metavar='PATH',
+                        help='ジャーナルの振り分け結果をまとめて適用して終了する')
+    parser.add_argument('--index', type=Path, default=None, metavar='PATH',
+                        help='ディレクトリを走査せず、コーパス索引（convert.py --index）から投稿を取得する')
+    parser.add_argument('--archive', type=Path, default=None, metavar='PATH',
+                        help='convert.py --archive のアーカイブ内の投稿を展開せずに確認する'
+                             '（振り分けはジャーナルに記録するだけで、展開後に --apply-journal で適用する）')
+    parser.add_argument('--dedup', action='store_true',
+                        help='ほぼ同じ内容の投稿をまとめ、1 件の判断をクラスタ全体に適用する')
+    parser.add_argument('--lookahead', type=int, default=8, metavar='N',
+                        help='手動確認で先読みする投稿数')
+    return parser.parse_args(argv)
+
+
 def main():
+    args = parse_args()
+    if args.archive and args.index:
+        print("エラー: --archive と --index は同時に指定できません")
+        return
+
+    if args.apply_journal:
+        stats = apply_journal(DecisionJournal.replay(args.apply_journal))
+        print(f"ジャーナル適用: 移動 {stats['moved']} 件 / 適用済み {stats['done']} 件 / "
+              f"見つからない {stats['missing']} 件")
+        return
+
     base_dir = Path(__file__).parent
     source_dir = base_dir / 'hugo-blog-content-candidate'
     # source_dir = base_dir / 'hugo-blog-content-suspicious-candidate'
     publish_dir = base_dir / 'hugo-blog' / 'content' / 'posts'
     nonpublish_dir = base_dir / 'hugo-blog-content-nonpublish'
+    journal_path = args.journal or base_dir / 'review-journal.jsonl'
 
     print("=" * 60)
     print("書籍感想・批評 振り分けツール")
     print("=" * 60)
     print()
 
-    posts = get_pending_posts(source_dir)
+    # 前回のセッションの記録を読み、未完了の移動を適用する
+    # （アーカイブの確認中は投稿がディスク上にないので適用しない）
+    decisions = DecisionJournal.replay(journal_path)
+    if decisions and args.archive:
+        print(f"ジャーナルから再開: 記録 {len(decisions)} 件")
+        print()
+    elif decisions:
+        stats = apply_journal(decisions)
+        print(f"ジャーナルから再開: 記録 {len(decisions)} 件 (未完了の移動を適用: {stats['moved']} 件)")
+        print()
+
+    index = CorpusIndex(args.index) if args.index else None
+    archive = BundleArchive(args.archive) if args.archive else None
+    if archive is not None:
+        # 展開後に source_dir に置かれる前提でパスを組み立てる
+        posts = [source_dir / name for name in archive.names()]
+        publishers = None
+        loader = lambda post: archive.read_index(post.name)
+    elif index is not None:
+        # 索引を引くだけで、投稿フォルダの走査や本文の読み込みは行わない
+        posts = [source_dir / slug for slug in index.pending_posts(source_dir)]
+        bodies = dict(index.posts_in(source_dir))
+        publishers = index.publisher_posts(source_dir)
+        loader = lambda post: bodies.get(post.name, "")
+    else:
+        posts = get_pending_posts(source_dir)
+        publishers = None
+        loader = get_post_content
+
+    # 振り分け済みの投稿は除く（アーカイブ内の投稿は移動されないので一覧に残っている）
+    # 再び確認するのは手動確認待ち・スキップの投稿だけ
+    posts = [post for post in posts
+             if decisions.get(post.name, {}).get('action') not in ('publish', 'nonpublish')]
 
     if not posts:
         print("処理する投稿がありません。")
+        if archive is not None:
+            archive.close()
         return
 
     total_posts = len(posts)
     print(f"処理待ち: {total_posts} 件")
     print()
 
+    journal = DecisionJournal(journal_path)
+
+    # 判定済み（スキップ・手動確認待ち）の投稿は自動判定をやり直さない
+    unseen = [post for post in posts if post.name not in decisions]
+    seen = [post for post in posts if post.name in decisions]
+
     print("出版社サイトURLを含む投稿を自動振り分け中...")
-    posts, auto_published = auto_publish_by_url(posts, publish_dir)
+    unseen, auto_published = auto_publish_by_url(unseen, publish_dir, journal, publishers,
+                                                 loader, move=archive is None)
+    journal.sync()
+    if index is not None:
+        for post in posts:
+            if post.name in publishers and post.name not in decisions:
+                index.set_location(post.name, publish_dir, 'published')
+        index.commit()
     print(f"  → 自動公開: {auto_published} 件")
     print()
 
+    # スキップ済みの投稿は後回しにする
+    posts = unseen + [p for p in seen if decisions[p.name]['action'] != 'skip'] \
+        + [p for p in seen if decisions[p.name]['action'] == 'skip']
+
     if not posts:
+        journal.close()
+        if index is not None:
+            index.close()
+        if archive is not None:
+            archive.close()
+            print(f"振り分けは {journal_path} に記録しました（展開後に --apply-journal で適用してください）")
         print("全件自動処理完了しました。")
         return
 
     print(f"手動確認が必要: {len(posts)} 件")
+    clusters = {}
+    if args.dedup:
+        hasher = MinHasher()
+        cache = SignatureCache(base_dir / '.dedup-cache.json', hasher)
+        found = find_clusters([(post.name, loader(post)) for post in posts], hasher=hasher, cache=cache)
+        cache.save()
+        clusters = cluster_lookup(found)
+        print(f"  類似投稿のクラスタ: {len(found)} 件（{len(clusters)} 件の投稿）")
     print()
     print("操作方法:")
     print("  1 : hugo-blog/content/posts に移動（公開）")
@@ -312,63 +671,107 @@ def main():
     published = 0
     nonpublished = 0
     skipped = 0
-
-    i = 0
-    while i < len(posts):
-        post = posts[i]
-        clear_screen()
-
-        remaining = len(posts) - i
-        print("=" * 60)
-        print(f"[{i + 1}/{len(posts)}] 残り: {remaining} 件")
-        print(f"フォルダ: {post.name}")
-        print("=" * 60)
-        print()
-
-        content = get_post_content(post)
-        print(content)
-
-        print()
-        print("-" * 60)
-        print("1=公開 | 2=非公開 | s=スキップ | q=終了")
-        print("-" * 60)
-
-        while True:
-            choice = input("選択: ").strip().lower()
-
-            if choice == '1':
-                dest = move_post(post, publish_dir)
-                print(f"→ 公開: {dest}")
-                published += 1
-                processed += 1
-                posts.pop(i)
-                break
-            elif choice == '2':
-                dest = move_post(post, nonpublish_dir)
-                print(f"→ 非公開: {dest}")
-                nonpublished += 1
-                processed += 1
-                posts.pop(i)
-                break
-            elif choice == 's':
-                print("→ スキップ")
-                skipped += 1
-                i += 1
-                break
-            elif choice == 'q':
-                print()
-                print("=" * 60)
-                print("終了")
-                print(f"  自動公開: {auto_published} 件")
-                print(f"  手動処理: {processed} 件")
-                print(f"    公開: {published} 件")
-                print(f"    非公開: {nonpublished} 件")
-                print(f"  スキップ: {skipped} 件")
-                print(f"  未処理: {len(posts)} 件")
-                print("=" * 60)
-                return
-            else:
-                print("1, 2, s, q のいずれかを入力してください")
+    # このセッションでスキップした（posts の i より前に残っている）投稿
+    skipped_posts = set()
+
+    enable_ansi_escapes()
+    prefetcher = PostPrefetcher(args.lookahead, loader)
+    mover = BackgroundMover() if archive is None else RecordOnlyMover()
+
+    try:
+        i = 0
+        while i < len(posts):
+            post = posts[i]
+            prefetcher.prefetch(posts[i:i + args.lookahead])
+            clear_screen()
+            mover.report_failures()
+
+            remaining = len(posts) - i
+            print("=" * 60)
+            print(f"[{i + 1}/{len(posts)}] 残り: {remaining} 件")
+            print(f"フォルダ: {post.name}")
+            siblings_pending = [p for p in posts if p.name in clusters.get(post.name, ()) and p != post]
+            if siblings_pending:
+                print(f"類似投稿: {len(siblings_pending)} 件（公開・非公開の判断をまとめて適用します）")
+            print("=" * 60)
+            print()
+
+            content = prefetcher.get(post)
+            print(content)
+
+            print()
+            print("-" * 60)
+            print("1=公開 | 2=非公開 | s=スキップ | q=終了")
+            print("-" * 60)
+
+            while True:
+                choice = input("選択: ").strip().lower()
+
+                if choice == '1':
+                    posts.pop(i)
+                    siblings = take_cluster_siblings(post, posts, clusters)
+                    # スキップ済みの投稿が含まれていれば、その分だけ位置と件数を戻す
+                    resolved_skips = sum(1 for p in siblings if p in skipped_posts)
+                    i -= resolved_skips
+                    skipped -= resolved_skips
+                    for target in [post] + siblings:
+                        journal.record(target, 'publish', publish_dir, auto=target is not post)
+                        if index is not None:
+                            index.set_location(target.name, publish_dir, 'published')
+                        dest = mover.move(target, publish_dir)
+                        print(f"→ 公開: {dest}")
+                    published += 1 + len(siblings)
+                    processed += 1 + len(siblings)
+                    break
+                elif choice == '2':
+                    posts.pop(i)
+                    siblings = take_cluster_siblings(post, posts, clusters)
+                    # スキップ済みの投稿が含まれていれば、その分だけ位置と件数を戻す
+                    resolved_skips = sum(1 for p in siblings if p in skipped_posts)
+                    i -= resolved_skips
+                    skipped -= resolved_skips
+                    for target in [post] + siblings:
+                        journal.record(target, 'nonpublish', nonpublish_dir, auto=target is not post)
+                        if index is not None:
+                            index.set_location(target.name, nonpublish_dir, 'nonpublished')
+                        dest = mover.move(target, nonpublish_dir)
+                        print(f"→ 非公開: {dest}")
+                    nonpublished += 1 + len(siblings)
+                    processed += 1 + len(siblings)
+                    break
+                elif choice == 's':
+                    journal.record(post, 'skip')
+                    if index is not None:
+                        index.set_review_state(post.name, 'skipped')
+                    print("→ スキップ")
+                    skipped += 1
+                    skipped_posts.add(post)
+                    i += 1
+                    break
+                elif choice == 'q':
+                    print()
+                    print("=" * 60)
+                    print("終了")
+                    print(f"  自動公開: {auto_published} 件")
+                    print(f"  手動処理: {processed} 件")
+                    print(f"    公開: {published} 件")
+                    print(f"    非公開: {nonpublished} 件")
+                    print(f"  スキップ: {skipped} 件")
+                    print(f"  未処理: {len(posts)} 件")
+                    print("=" * 60)
+                    return
+                else:
+                    print("1, 2, s, q のいずれかを入力してください")
+    finally:
+        prefetcher.close()
+        # 予約済みの移動がすべて終わるまで待つ
+        mover.close()
+        journal.close()
+        if index is not None:
+            index.close()
+        if archive is not None:
+            archive.close()
+            print(f"振り分けは {journal_path} に記録しました（展開後に --apply-journal で適用してください）")
 
     print()
     print("=" * 60)
@@ -0,0 +1,62 @@
+"""
+bundle_archive.py の検証
+- 書き出した Page Bundle を tar / tar.gz / zip から名前順に読めるか
+- 書き込み途中で失敗したときに一時ファイルを残さないか
+
+使い方:
+  python -m pytest tests
+  python -m unittest discover tests
+"""
+
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from bundle_archive import ArchiveSink, BundleArchive  # noqa: E402
+
+
+class BundleArchiveTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self.tmp.name)
+        media = self.root / 'photo.jpg'
+        media.write_bytes(b'x' * 100)
+        # 投稿順（新しい順）に書き出すので、アーカイブ内の順序は名前の逆順になる
+        self.bundles = [(f"2023-10-{day:02d}-post", f"# {day}日の投稿\n") for day in range(20, 0, -1)]
+        self.media = [(str(media), 'photo.jpg')]
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_round_trip(self):
+        for suffix in ('.tar', '.tar.gz', '.zip'):
+            with self.subTest(suffix=suffix):
+                path = self.root / f"posts{suffix}"
+                with ArchiveSink(path) as sink:
+                    for name, article in self.bundles:
+                        sink.add_bundle(name, article.encode('utf-8'), self.media, 1700000000)
+                self.assertFalse(path.with_name(path.name + '.tmp').exists())
+
+                with BundleArchive(path) as archive:
+                    self.assertEqual(list(archive.iter_bundles()), sorted(self.bundles))
+                    self.assertEqual(archive.read_index('2023-10-05-post'), '# 5日の投稿\n')
+                    self.assertEqual(archive.read_index('missing'), '')
+
+    def test_abort_removes_partial_archive(self):
+        for suffix in ('.tar', '.tar.gz', '.zip'):
+            with self.subTest(suffix=suffix):
+                path = self.root / f"partial{suffix}"
+                with self.assertRaises(RuntimeError):
+                    with ArchiveSink(path) as sink:
+                        name, article = self.bundles[0]
+                        sink.add_bundle(name, article.encode('utf-8'))
+                        raise RuntimeError('変換の途中で失敗')
+                self.assertEqual(list(self.root.glob('partial*')), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,112 @@
+"""
+classify_books.py の分類器（ClassifierEngine）が、パターンを 1 つずつ照合する
+従来の分類処理と同じ結果を返すかの検証
+
+使い方:
+  python -m pytest tests
+  python -m unittest discover tests
+"""
+
+import random
+import re
+import sys
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from classify_books import (  # noqa: E402
+    CLASSIFIER,
+    DEFINITE_BOOK_PATTERNS,
+    EXCLUDE_PATTERNS,
+    SUSPICIOUS_BOOK_PATTERNS,
+    classify_post,
+)
+
+POSTS_DIR = Path(__file__).resolve().parent.parent / 'hugo-blog' / 'content' / 'posts'
+
+# 各パターンに一致しうる断片（組み合わせて合成投稿を作る）
+FRAGMENTS = [
+    '読了しました', '読み終えた', '本を読んだ', '書評を書いた', 'この本は良かった',
+    '小説の感想', 'Kindleで買った', '図書館で借りた', '積読が増える', '名著です',
+    '『吾輩は猫である』', '「坊っちゃん」を読んだ', '読んでいる', '本', '漫画', '著者',
+    '物語', '講談社', '面白かった', '第3巻', 'シリーズ完結', '主人公', 'ISBN 978-4-00',
+    '本屋に寄った', 'Amazonで', '話題の', '本日', '本当に', '日本', '絵本', '技術書',
+    '写真集', 'KINDLE', 'おすすめの本', 'レビュー記事', '今日は晴れ', 'ランチ',
+    'https://www.example.com/', '旅行に行った', '会議', '\n', ' ',
+]
+
+
+def classify_post_reference(content: str) -> str:
+    """パターンを 1 つずつ照合する従来の分類処理"""
+    for pattern in DEFINITE_BOOK_PATTERNS:
+        if re.search(pattern, content, re.IGNORECASE):
+            return 'definite'
+
+    suspicious_count = 0
+    for pattern in SUSPICIOUS_BOOK_PATTERNS:
+        if re.search(pattern, content, re.IGNORECASE):
+            suspicious_count += 1
+
+    exclude_count = 0
+    for pattern in EXCLUDE_PATTERNS:
+        if re.search(pattern, content, re.IGNORECASE):
+            exclude_count += 1
+
+    if suspicious_count >= 2 and suspicious_count > exclude_count:
+        return 'suspicious'
+
+    return 'nonpublish'
+
+
+def reference_hits(content: str) -> dict[str, list[str]]:
+    """パターン群ごとに一致したパターン（1 つずつ照合）"""
+    return {
+        name: [p for p in patterns if re.search(p, content, re.IGNORECASE)]
+        for name, patterns in (('definite', DEFINITE_BOOK_PATTERNS),
+                               ('suspicious', SUSPICIOUS_BOOK_PATTERNS),
+                               ('exclude', EXCLUDE_PATTERNS))
+    }
+
+
+def synthetic_posts(count: int, seed: int = 0) -> list[str]:
+    """断片をランダムに組み合わせた合成投稿"""
+    rng = random.Random(seed)
+    return [''.join(rng.choices(FRAGMENTS, k=rng.randint(0, 8))) for _ in range(count)]
+
+
+class ClassifierEquivalenceTest(unittest.TestCase):
+
+    def assert_equivalent(self, content: str, label: str):
+        expected = classify_post_reference(content)
+        verdict, hits = CLASSIFIER.classify_detail(content)
+        self.assertEqual(classify_post(content), expected, label)
+        self.assertEqual(verdict, expected, label)
+        self.assertEqual(hits, reference_hits(content), label)
+        # キャッシュが空でも一部だけあっても同じ結果になる
+        self.assertEqual(CLASSIFIER.classify_incremental(content, {})[:2], (verdict, hits), label)
+        partial = {'definite': {p: p in hits['definite'] for p in DEFINITE_BOOK_PATTERNS[::2]}}
+        self.assertEqual(CLASSIFIER.classify_incremental(content, partial)[:2], (verdict, hits), label)
+
+    def test_fragments(self):
+        for fragment in FRAGMENTS:
+            self.assert_equivalent(fragment, repr(fragment))
+
+    def test_synthetic_posts(self):
+        verdicts = set()
+        for i, content in enumerate(synthetic_posts(3000)):
+            self.assert_equivalent(content, f"合成投稿 {i}: {content!r}")
+            verdicts.add(classify_post(content))
+        # 3 種類の分類結果がすべて現れる入力で検証できている
+        self.assertEqual(verdicts, {'definite', 'suspicious', 'nonpublish'})
+
+    def test_published_posts(self):
+        paths = sorted(POSTS_DIR.glob('*/index.md'))
+        if not paths:
+            self.skipTest(f"投稿がありません: {POSTS_DIR}")
+        for path in paths:
+            self.assert_equivalent(path.read_text(encoding='utf-8'), str(path))
+
+
+if __name__ == '__main__':
+    unittest.main()
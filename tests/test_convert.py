@@ -0,0 +1,188 @@
+"""
+convert.py の検証
+- ストリーミング読み込み（iter_facebook_posts）が json.load と同じ入力を受け付け、同じ入力を拒否するか
+- ディレクトリ名の索引（SlugIndex）が大文字・小文字だけ異なる名前を重複として扱うか
+- 増分変換で新しい投稿が増えても既存の投稿のディレクトリ名が変わらないか
+- 同時に使えないコマンドライン引数を変換の前に拒否するか
+
+使い方:
+  python -m pytest tests
+  python -m unittest discover tests
+"""
+
+import contextlib
+import io
+import json
+import sys
+import tempfile
+import unittest
+from datetime import datetime
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from convert import (  # noqa: E402
+    MANIFEST_FILENAME,
+    SlugIndex,
+    convert_posts_to_hugo,
+    iter_facebook_posts,
+    parse_args,
+)
+
+VALID = [
+    '[]',
+    '  [ ]\n',
+    '[1]',
+    '[1, 2, {"a": [1, 2]} , "x"]',
+    '[12345678901234567890, 3]',
+    '[{"data": [{"post": "読了"}]}]\n\n',
+]
+
+INVALID = [
+    '[1 2]',
+    '[1,]',
+    '[1, 2,\n]',
+    '[,1]',
+    '[1,,2]',
+    '[1, 2] x',
+    '[1, 2]]',
+    '[] []',
+    '[1',
+    '[1,',
+    '[',
+    '{}',
+]
+
+
+class IterFacebookPostsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = Path(self.tmp.name) / 'posts.json'
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def read(self, text: str, chunk_size: int) -> list:
+        self.path.write_text(text, encoding='utf-8')
+        return list(iter_facebook_posts(self.path, chunk_size))
+
+    def test_valid(self):
+        # バッファ境界がどこに来ても同じ結果になる
+        for text in VALID:
+            for chunk_size in (1, 2, 3, 1 << 16):
+                with self.subTest(text=text, chunk_size=chunk_size):
+                    self.assertEqual(self.read(text, chunk_size), json.loads(text))
+
+    def test_invalid(self):
+        for text in INVALID:
+            for chunk_size in (1, 2, 3, 1 << 16):
+                with self.subTest(text=text, chunk_size=chunk_size):
+                    with self.assertRaises(ValueError):
+                        self.read(text, chunk_size)
+
+
+class SlugIndexTest(unittest.TestCase):
+
+    def test_case_insensitive(self):
+        index = SlugIndex()
+        assigned = [index.assign(name) for name in (
+            '2020-01-01-Kindle', '2020-01-01-kindle', '2020-01-01-KINDLE', '2020-01-01-kindle-2')]
+        self.assertEqual(assigned, [
+            '2020-01-01-Kindle', '2020-01-01-kindle-2', '2020-01-01-KINDLE-3', '2020-01-01-kindle-2-2'])
+        self.assertEqual(len({name.casefold() for name in assigned}), len(assigned))
+        self.assertEqual(len(index.collisions), 3)
+
+
+def write_export(root: Path, posts: list[tuple[int, str]]) -> Path:
+    """(タイムスタンプ, 本文) の一覧を Facebook のエクスポート形式で書き出し、投稿 JSON のパスを返す"""
+    json_path = root / 'your_facebook_activity' / 'posts' / 'your_posts__check_ins__photos_and_videos_1.json'
+    json_path.parent.mkdir(parents=True, exist_ok=True)
+    raw = [{'timestamp': timestamp, 'data': [{'post': text}]} for timestamp, text in posts]
+    json_path.write_text(json.dumps(raw), encoding='utf-8')
+    return json_path
+
+
+class IncrementalConvertTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self.tmp.name)
+        self.output_dir = self.root / 'hugo-blog'
+        self.manifest_path = self.output_dir / MANIFEST_FILENAME
+        # 同じ日の 9:00 と 12:34:56（ローカル時刻）
+        self.older = int(datetime(2023, 10, 16, 9, 0, 0).timestamp())
+        self.newer = int(datetime(2023, 10, 16, 12, 34, 56).timestamp())
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def convert(self, posts: list[tuple[int, str]], **kwargs) -> dict:
+        """変換して、マニフェストの last_run を返す"""
+        json_path = write_export(self.root, posts)
+        with contextlib.redirect_stdout(io.StringIO()):
+            convert_posts_to_hugo(json_path, self.output_dir, json_path.parent.parent,
+                                  manifest_path=self.manifest_path, **kwargs)
+        return json.loads(self.manifest_path.read_text(encoding='utf-8'))['last_run']
+
+    def read_article(self, dirname: str) -> str:
+        return (self.output_dir / 'content' / 'posts' / dirname / 'index.md').read_text(encoding='utf-8')
+
+    def test_newer_colliding_post_keeps_existing_name(self):
+        # ディレクトリ名に使うのはタイトルの先頭 30 文字
+        self.convert([(self.older, 'same title for both posts here, older')])
+        name = '2023-10-16-same-title-for-both-posts-here'
+        article = self.read_article(name)
+
+        # 新しい順のエクスポートで、同じ日・同じ先頭部分の新しい投稿が先頭に増える
+        last_run = self.convert([(self.newer, 'same title for both posts here, newer'),
+                                 (self.older, 'same title for both posts here, older')])
+        self.assertEqual(self.read_article(name), article)
+        self.assertIn('newer', self.read_article(f"{name}-123456"))
+        self.assertEqual(last_run, {'added': [f"{name}-123456"], 'changed': [], 'removed': []})
+
+    def test_last_run_lists_are_disjoint(self):
+        self.convert([(self.older, 'same title for both posts here, older')])
+        name = '2023-10-16-same-title-for-both-posts-here'
+
+        # 既存の投稿のタイトルが変わって空いた名前に、新しい投稿が入る
+        last_run = self.convert([(self.newer, 'same title for both posts here, newer'),
+                                 (self.older, 'another title for older one')])
+        self.assertEqual(last_run['added'], [name])
+        self.assertEqual(last_run['changed'], ['2023-10-16-another-title-for-older-one'])
+        self.assertEqual(last_run['removed'], [])
+        lists = [set(last_run[kind]) for kind in ('added', 'changed', 'removed')]
+        self.assertEqual(sum(map(len, lists)), len(set.union(*lists)))
+
+    def test_last_run_paths_in_year_month_layout(self):
+        self.convert([(self.older, 'same title for both posts here, older')], layout='year-month')
+        last_run = self.convert([(self.older, 'another title for older one')], layout='year-month')
+        # 3 つの一覧とも content/posts からの相対パス（YYYY/MM/ディレクトリ名）で記録する
+        self.assertEqual(last_run, {
+            'added': [],
+            'changed': ['2023/10/2023-10-16-another-title-for-older-one'],
+            'removed': ['2023/10/2023-10-16-same-title-for-both-posts-here'],
+        })
+
+
+class ParseArgsTest(unittest.TestCase):
+
+    def assert_rejected(self, argv: list[str]):
+        with contextlib.redirect_stderr(io.StringIO()):
+            with self.assertRaises(SystemExit) as cm:
+                parse_args(argv)
+        self.assertEqual(cm.exception.code, 2)
+
+    def test_year_month_layout_with_archive(self):
+        self.assert_rejected(['--layout', 'year-month', '--archive', 'posts.tar'])
+        self.assertEqual(parse_args(['--archive', 'posts.tar']).layout, 'flat')
+
+    def test_profile_range_requires_cprofile(self):
+        self.assert_rejected(['--profile-range', '10:20'])
+        self.assert_rejected(['--profile', '--profile-range', '10:20'])
+        args = parse_args(['--cprofile', 'out.prof', '--profile-range', '10:20'])
+        self.assertEqual(args.profile_range, (10, 20))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,78 @@
+"""
+move_planner.py の検証
+- 同じデバイスと判定した組で rename が EXDEV で失敗したとき、コピーで移動を完了するか
+
+使い方:
+  python -m pytest tests
+  python -m unittest discover tests
+"""
+
+import errno
+import os
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import move_planner  # noqa: E402
+from move_planner import MovePlan  # noqa: E402
+
+
+class MovePlanTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        root = Path(self.tmp.name)
+        self.src_dir = root / 'candidate'
+        self.dest_dir = root / 'posts'
+        self.sources = []
+        for name in ('2020-01-01-a', '2020-01-02-b'):
+            post_dir = self.src_dir / name
+            post_dir.mkdir(parents=True)
+            (post_dir / 'index.md').write_text(f"# {name}\n", encoding='utf-8')
+            (post_dir / 'photo.jpg').write_bytes(b'x' * 100)
+            self.sources.append(post_dir)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def assert_moved(self):
+        for src in self.sources:
+            self.assertFalse(src.exists())
+            self.assertEqual((self.dest_dir / src.name / 'photo.jpg').read_bytes(), b'x' * 100)
+        self.assertEqual(sorted(os.listdir(self.dest_dir)), [src.name for src in self.sources])
+
+    def test_rename(self):
+        plan = MovePlan()
+        for src in self.sources:
+            plan.add(src, self.dest_dir)
+        stats = plan.execute(progress=0)
+        self.assertEqual((stats['renamed'], stats['copied'], stats['failed']), (2, 0, 0))
+        self.assert_moved()
+
+    def test_exdev_falls_back_to_copy(self):
+        real_rename = os.rename
+
+        def rename(src, dest):
+            # 移動元からの rename だけを別デバイス扱いにする
+            if Path(src).parent == self.src_dir:
+                raise OSError(errno.EXDEV, os.strerror(errno.EXDEV))
+            return real_rename(src, dest)
+
+        plan = MovePlan()
+        for src in self.sources:
+            plan.add(src, self.dest_dir)
+        moved = []
+        with mock.patch.object(move_planner.os, 'rename', rename):
+            stats = plan.execute(on_moved=lambda src, dest_dir: moved.append(src), progress=0)
+        self.assertEqual((stats['renamed'], stats['copied'], stats['failed']), (0, 2, 0))
+        self.assertGreater(stats['bytes'], 200)
+        self.assertEqual(moved, self.sources)
+        self.assert_moved()
+
+
+if __name__ == '__main__':
+    unittest.main()
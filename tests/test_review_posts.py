@@ -0,0 +1,56 @@
+"""
+review_posts.py の検証
+- 先読み（PostPrefetcher）が lookahead 件の範囲だけを予約し、各投稿を 1 回だけ読むか
+
+使い方:
+  python -m pytest tests
+  python -m unittest discover tests
+"""
+
+import sys
+import threading
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from review_posts import PostPrefetcher  # noqa: E402
+
+
+class PostPrefetcherTest(unittest.TestCase):
+
+    def test_bounded_window(self):
+        loaded = []
+        lock = threading.Lock()
+
+        def loader(post: Path) -> str:
+            with lock:
+                loaded.append(post)
+            return post.name
+
+        lookahead = 3
+        posts = [Path(f"2023-10-{day:02d}-post") for day in range(1, 21)]
+        prefetcher = PostPrefetcher(lookahead, loader)
+        try:
+            for i, post in enumerate(posts):
+                prefetcher.prefetch(posts[i:i + lookahead])
+                self.assertLessEqual(len(prefetcher._futures), lookahead)
+                self.assertEqual(prefetcher.get(post), post.name)
+        finally:
+            prefetcher.close()
+        self.assertEqual(sorted(loaded), posts)
+
+    def test_drops_posts_outside_window(self):
+        posts = [Path(f"post-{i}") for i in range(6)]
+        prefetcher = PostPrefetcher(2, loader=lambda post: post.name)
+        try:
+            prefetcher.prefetch(posts[0:2])
+            # 先頭の 2 件をまとめて振り分けた後は、その予約を持ち続けない
+            prefetcher.prefetch(posts[2:4])
+            self.assertEqual(set(prefetcher._futures), set(posts[2:4]))
+        finally:
+            prefetcher.close()
+
+
+if __name__ == '__main__':
+    unittest.main()